@@ -0,0 +1,923 @@
+""" File: sudoku_fuzz.py
+    Author: Kevin Cascais Nisterenko
+    Purpose: This program checks that the fast paths of sudoku_helper.py
+             give the same results as the reference functions. It generates
+             random valid and invalid boards in chunks, runs both versions
+             of every check on them (with the chunks split among worker
+             processes), prints the first board where they disagree, made as
+             small as possible, and how much faster the fast path is.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import sudoku_helper
+
+def random_solution(rng):
+    """
+    This function builds a random solved grid by shuffling the values, the
+    columns inside every band, the bands, and the rows in the same way, of a
+    known solved pattern.
+
+    Parameters:
+        rng -- random.Random object used for every shuffle.
+
+    Returns:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Pre-condition:
+        The rng object must be passed into the function.
+
+    Post-condition:
+        The function will return a solved grid array to the program.
+    """
+    nums = list(range(1, 10))
+    rng.shuffle(nums)
+
+    order = []
+    for _ in range(2):
+        bands = [0, 1, 2]
+        rng.shuffle(bands)
+        lines = []
+        for band in bands:
+            inside = [0, 1, 2]
+            rng.shuffle(inside)
+            lines.extend(band * 3 + i for i in inside)
+        order.append(lines)
+    cols, rows = order
+
+    #  The pattern puts (3 * (row % 3) + row // 3 + col) % 9 at every space,
+    #  which is a solved grid, and every shuffle above keeps it solved.
+    return [[nums[(3 * (row % 3) + row // 3 + col) % 9] for row in rows]
+            for col in cols]
+
+def random_board(rng):
+    """
+    This function builds a random board by emptying spaces of a random solved
+    grid. About half of the boards are then made invalid by writing random
+    values in random spaces, which usually causes conflicts.
+
+    Parameters:
+        rng -- random.Random object used for every choice.
+
+    Returns:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Pre-condition:
+        The rng object must be passed into the function.
+
+    Post-condition:
+        The function will return a board to the program.
+    """
+    grid = random_solution(rng)
+    empty = rng.randint(0, 81)
+
+    for index in rng.sample(range(81), empty):
+        grid[index // 9][index % 9] = 0
+
+    if rng.random() < 0.5:
+        for _ in range(rng.randint(1, 4)):
+            grid[rng.randrange(9)][rng.randrange(9)] = rng.randint(0, 9)
+
+    return grid
+
+def fast_possible_values(grid):
+    """
+    This function is the fast path of the 'search' check: it reads the
+    possible values from the pencil marks of the grid.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        possible -- array of tuples (col, row, nums) for every empty space in
+                    row order.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the possible array to the program.
+    """
+    masks = sudoku_helper.get_candidate_masks(grid)
+    return sudoku_helper.masks_to_possible_values(grid, masks)
+
+def replay_game(grid):
+    """
+    This function empties the last spaces of the grid, builds a BoardEngine
+    from that and sets the values back with its set_value method, one move
+    each.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        engine -- BoardEngine object whose current grid is the passed one.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the engine to the program.
+    """
+    start = [list(column) for column in grid]
+    moves = []
+
+    for index in range(80, 40, -1):
+        col, row = index // 9, index % 9
+        if start[col][row] != 0:
+            moves.append((col, row, start[col][row]))
+            start[col][row] = 0
+
+    engine = sudoku_helper.BoardEngine(start)
+    for col, row, val in reversed(moves):
+        engine.set_value(col, row, val)
+
+    return engine
+
+def incremental_candidate_masks(grid):
+    """
+    This function is the fast path of the 'incremental' check: it returns
+    the pencil marks that the engine of the replay_game function kept up to
+    date along its 'set' commands.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        masks -- tuple of 81 integers, the marks of every space by index.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the masks tuple to the program.
+    """
+    return replay_game(grid).get_candidate_masks()
+
+def back_to_start(engine, reload_at=None):
+    """
+    This function keeps applying 'back' to the engine until the initial grid
+    is reached, and returns every grid on the way. When reload_at is given,
+    the game is saved and loaded again into a new engine before the 'back'
+    with that number, as well as before the first one.
+
+    Parameters:
+        engine -- BoardEngine object of the game.
+        reload_at -- integer number of 'back' commands after which the game
+                     is reloaded, or None to never reload.
+
+    Returns:
+        grids -- array of the frozen grids, the current one first.
+
+    Pre-condition:
+        The engine must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the grids array to the program.
+    """
+    grids = [engine.snapshot()]
+    backs = 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            if reload_at is not None and backs in (0, reload_at):
+                grid, log = sudoku_helper.decode_game(engine.save())
+                engine = sudoku_helper.BoardEngine(grid, log)
+            grid = engine.go_back()
+            backs += 1
+            if grid is grids[-1] or grid == grids[-1]:
+                return grids
+            grids.append(grid)
+
+def saved_history(grid):
+    """
+    This function is the reference of the 'save' check: the grids of the
+    history of the replay_game engine, read by going back in it.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        grids -- array of the frozen grids, the current one first.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the grids array to the program.
+    """
+    return back_to_start(replay_game(grid))
+
+def loaded_history(grid):
+    """
+    This function is the fast path of the 'save' check: the same grids, read
+    by going back in games that were saved and loaded, once with the whole
+    history still in the log and once part way through rebuilding it.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        grids -- array of the frozen grids, the current one first.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the grids array to the program.
+    """
+    moves = 0
+    for column in grid:
+        moves += sum(1 for num in column if num != 0)
+
+    return back_to_start(replay_game(grid), moves // 4)
+
+#  A jigsaw layout where the regions of every band are shifted left by one
+#  column on each row, so that no region is a 3x3 sub-region.
+JIGSAW_LAYOUT = ["111222333", "112223331", "122233311",
+                 "444555666", "445556664", "455566644",
+                 "777888999", "778889997", "788899977"]
+
+#  The variants checked by the 'variants' check.
+VARIANT_MODELS = {
+    "diagonal": sudoku_helper.get_diagonal_model(),
+    "jigsaw": sudoku_helper.get_jigsaw_model(JIGSAW_LAYOUT),
+}
+
+def has_repeat(nums):
+    """
+    This function checks whether a value other than zero is in the array
+    more than once.
+
+    Parameters:
+        nums -- array of integers.
+
+    Returns:
+        repeat -- boolean that is True if a value repeats.
+
+    Pre-condition:
+        The nums array must be passed into the function.
+
+    Post-condition:
+        The function will return whether a value repeats to the program.
+    """
+    filled = [num for num in nums if num != 0]
+    return len(filled) != len(set(filled))
+
+def scan_variant_conflicts(grid):
+    """
+    This function is the reference of the 'variants' check: it builds the
+    regions of every variant in VARIANT_MODELS by walking the grid by hand
+    and returns the regions where a value repeats.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        conflicts -- sorted array of (variant, kind, key) tuples.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the conflicts array to the program.
+    """
+    lines = []
+    for i in range(9):
+        lines.append(("Column", i + 1, [grid[i][row] for row in range(9)]))
+        lines.append(("Row", i + 1, [grid[col][i] for col in range(9)]))
+
+    squares = []
+    for x in range(3):
+        for y in range(3):
+            squares.append(("Sub-region", (x + 1, y + 1),
+                            [grid[col][row] for col in range(x * 3, x * 3 + 3)
+                             for row in range(y * 3, y * 3 + 3)]))
+    diagonals = [("Diagonal", 1, [grid[i][i] for i in range(9)]),
+                 ("Diagonal", 2, [grid[i][8 - i] for i in range(9)])]
+
+    pieces = []
+    for name in sorted(set("".join(JIGSAW_LAYOUT))):
+        pieces.append(("Region", name,
+                       [grid[col][row] for row in range(9) for col in range(9)
+                        if JIGSAW_LAYOUT[row][col] == name]))
+
+    regions = {"diagonal": lines + squares + diagonals,
+               "jigsaw": lines + pieces}
+    conflicts = []
+    for variant in VARIANT_MODELS:
+        for kind, key, nums in regions[variant]:
+            if has_repeat(nums):
+                conflicts.append((variant, kind, key))
+
+    return sorted(conflicts)
+
+def model_variant_conflicts(grid):
+    """
+    This function is the fast path of the 'variants' check: the conflicts
+    found by the get_conflicts method of every model in VARIANT_MODELS.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        conflicts -- sorted array of (variant, kind, key) tuples.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the conflicts array to the program.
+    """
+    conflicts = []
+    for variant, model in VARIANT_MODELS.items():
+        for kind, key in model.get_conflicts(grid):
+            conflicts.append((variant, kind, key))
+
+    return sorted(conflicts)
+
+def killer_puzzle(board):
+    """
+    This function turns a board into a killer puzzle: every other third of
+    a row that is full becomes a cage with the sum of its values, and is
+    emptied. Only boards without conflicts and with at most 45 empty spaces
+    are used, since proving that a sparse board has no solution can take
+    any solver a very long time.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        start -- array where each element is an array of integers organized
+                 by columns, the givens of the puzzle, or None if the board
+                 is not used.
+        cages -- array of (target, spaces) tuples, or None if the board is
+                 not used.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the puzzle to the program.
+    """
+    empty = 0
+    for column in board:
+        empty += sum(1 for num in column if num == 0)
+    if empty > 45 or sudoku_helper.get_conflicts_fast(board) != ([], [], []):
+        return None, None
+
+    start = [list(column) for column in board]
+    cages = []
+    for row in range(9):
+        for band in range(row % 2, 3, 2):
+            spaces = [col * 9 + row for col in range(band * 3, band * 3 + 3)]
+            if all(start[index // 9][index % 9] != 0 for index in spaces):
+                cages.append((sum(start[index // 9][index % 9]
+                                  for index in spaces), spaces))
+                for index in spaces:
+                    start[index // 9][index % 9] = 0
+
+    return start, cages
+
+def check_solution(start, model, solved):
+    """
+    This function says whether a solver answer is a solution of the puzzle:
+    a full grid that keeps the givens and has no conflicts in the model.
+
+    Parameters:
+        start -- array where each element is an array of integers organized
+                 by columns, the givens of the puzzle.
+        model -- ConstraintModel object of the puzzle.
+        solved -- array returned by the solver, or None.
+
+    Returns:
+        result -- string 'none' if there is no answer, 'valid' or 'invalid'.
+
+    Pre-condition:
+        The start array and the model must be passed into the function.
+
+    Post-condition:
+        The function will return the result to the program.
+    """
+    if solved is None:
+        return "none"
+    for col in range(9):
+        for row in range(9):
+            num = solved[col][row]
+            if num == 0 or start[col][row] not in (0, num):
+                return "invalid"
+    if model.get_conflicts(solved):
+        return "invalid"
+    return "valid"
+
+def solve_killer(board):
+    """
+    This function is the reference of the 'killer' check: the killer puzzle
+    of the board, with the model built by get_killer_model, solved with
+    constraint propagation.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        result -- string returned by check_solution, or None if the board
+                  is not used.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the result to the program.
+    """
+    start, cages = killer_puzzle(board)
+    if start is None:
+        return None
+
+    model = sudoku_helper.get_killer_model(cages)
+    return check_solution(start, model,
+                          sudoku_helper.solve_fewest_candidates(start, model))
+
+def write_variant_file(lines):
+    """
+    This function writes the lines to a new temporary variant file and
+    reads it back with the read_model_file function, throwing away the
+    messages it prints.
+
+    Parameters:
+        lines -- array of strings, the lines of the file.
+
+    Returns:
+        model -- ConstraintModel object returned by read_model_file, or
+                 None.
+
+    Pre-condition:
+        The lines array must be passed into the function.
+
+    Post-condition:
+        The function will return the model to the program and remove the
+        file.
+    """
+    handle, filename = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(handle, "w") as out_file:
+        out_file.write("\n".join(lines) + "\n")
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sudoku_helper.read_model_file(filename)
+    finally:
+        os.remove(filename)
+
+def cage_line(target, spaces):
+    """
+    This function returns the line of a variant file for a killer cage.
+
+    Parameters:
+        target -- integer sum of the cage.
+        spaces -- array of the indexes of the spaces of the cage.
+
+    Returns:
+        line -- string 'cage' followed by the target and every col,row.
+
+    Pre-condition:
+        The target and spaces must be passed into the function.
+
+    Post-condition:
+        The function will return the line to the program.
+    """
+    return " ".join(["cage", str(target)] +
+                    ["{},{}".format(index // 9 + 1, index % 9 + 1)
+                     for index in spaces])
+
+def solve_killer_file(board):
+    """
+    This function is the fast path of the 'killer' check: the same puzzle,
+    with the model read back from a variant file, solved as an exact cover
+    problem.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        result -- string returned by check_solution, or None if the board
+                  is not used.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the result to the program.
+    """
+    start, cages = killer_puzzle(board)
+    if start is None:
+        return None
+
+    model = write_variant_file([cage_line(target, spaces)
+                                for target, spaces in cages])
+    if model is None:
+        return "unreadable"
+    return check_solution(start, model,
+                          sudoku_helper.solve_exact_cover(start, model))
+
+def random_variant_file(board):
+    """
+    This function builds the lines of a random variant file from a seed
+    taken from the board: a diagonal or jigsaw shape, or none, and some
+    cages. About half of the files are then broken by one change that
+    read_model_file must reject.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        lines -- array of strings, the lines of the file.
+        model -- ConstraintModel object the file describes, or None if the
+                 file was broken.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the lines and the model to the program.
+    """
+    rng = random.Random(repr(board))
+    lines = []
+    shape = rng.choice(["classic", "diagonal", "jigsaw"])
+    if shape == "diagonal":
+        lines.append("diagonal")
+        model = sudoku_helper.get_diagonal_model()
+    elif shape == "jigsaw":
+        lines.append("jigsaw")
+        lines.extend(JIGSAW_LAYOUT)
+        model = sudoku_helper.get_jigsaw_model(JIGSAW_LAYOUT)
+    else:
+        model = sudoku_helper.CLASSIC_MODEL
+
+    cages = []
+    for spaces in [rng.sample(range(81), rng.randint(1, 4))
+                   for _ in range(rng.randint(0, 3))]:
+        size = len(spaces)
+        target = rng.randint(size * (size + 1) // 2, size * (19 - size) // 2)
+        cages.append((target, spaces))
+        lines.append(cage_line(target, spaces))
+    if cages:
+        model = sudoku_helper.get_killer_model(cages, model)
+
+    if rng.random() < 0.5:
+        return lines, model
+
+    breaks = ["cage x 1,1", "cage 5 10,1", "cage 5 1-1", "cage 5 1,1 1,1",
+              "cage 18 1,1 2,1", "cage", "killer", "diagonal diagonal"]
+    if shape != "classic":
+        breaks.append(rng.choice(["diagonal", "jigsaw"]))
+    if shape == "jigsaw":
+        breaks.extend(["short layout", "uneven layout"])
+    broken = rng.choice(breaks)
+
+    if broken == "short layout":
+        del lines[rng.randint(1, 9)]
+    elif broken == "uneven layout":
+        row = rng.randint(1, 9)
+        lines[row] = lines[row][:-1] + ("1" if lines[row][-1] != "1" else "2")
+    elif shape == "jigsaw":
+        lines.insert(rng.choice([0] + list(range(10, len(lines) + 1))),
+                     broken)
+    else:
+        lines.insert(rng.randint(0, len(lines)), broken)
+
+    return lines, None
+
+def model_summary(model):
+    """
+    This function returns what the 'model-file' check compares of a model.
+
+    Parameters:
+        model -- ConstraintModel object, or None.
+
+    Returns:
+        summary -- (regions, cages) tuple of the model, or None.
+
+    Pre-condition:
+        None
+
+    Post-condition:
+        The function will return the summary to the program.
+    """
+    return None if model is None else (model.regions, model.cages)
+
+def expected_model_file(board):
+    """
+    This function is the reference of the 'model-file' check: the model
+    random_variant_file built while writing the lines.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns, used as the seed.
+
+    Returns:
+        summary -- model_summary of the model, or None for a broken file.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the summary to the program.
+    """
+    return model_summary(random_variant_file(board)[1])
+
+def read_model_file_lines(board):
+    """
+    This function is the fast path of the 'model-file' check: the same
+    lines, written to a file and read back by read_model_file.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns, used as the seed.
+
+    Returns:
+        summary -- model_summary of the model read, or None if the file was
+                   rejected.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the summary to the program.
+    """
+    return model_summary(write_variant_file(random_variant_file(board)[0]))
+
+#  The traces of the 'trace' check are small, so that most of them wrap.
+TRACE_CAPACITY = 64
+
+def record_search(board):
+    """
+    This function records, with eliminations, the events of a 'search' of
+    the board read from its pencil marks.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        trace -- SolveTrace object of TRACE_CAPACITY events.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the trace to the program.
+    """
+    trace = sudoku_helper.SolveTrace(TRACE_CAPACITY, eliminations=True)
+    masks = sudoku_helper.get_candidate_masks(board)
+    sudoku_helper.masks_to_possible_values(board, masks, trace)
+    return trace
+
+def traced_events(board):
+    """
+    This function is the reference of the 'trace' check: the events of
+    record_search, without their times, which differ on every run.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        events -- array of (kind, index, num, depth) tuples, oldest first.
+        kept -- always True, the times of the fast path must be kept.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the events to the program.
+    """
+    return [event[1:] for event in record_search(board).events()], True
+
+def reloaded_events(board):
+    """
+    This function is the fast path of the 'trace' check: the events of
+    record_search after they are exported, loaded back with load_trace and
+    copied into a new trace with its extend method.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns.
+
+    Returns:
+        events -- array of (kind, index, num, depth) tuples, oldest first.
+        kept -- boolean that is True if the times came back unchanged.
+
+    Pre-condition:
+        The board array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the events to the program and remove the
+        trace file.
+    """
+    trace = record_search(board)
+    handle, filename = tempfile.mkstemp(suffix=".sdt")
+    os.close(handle)
+    try:
+        trace.export(filename)
+        loaded = sudoku_helper.load_trace(filename)
+    finally:
+        os.remove(filename)
+
+    copy = sudoku_helper.SolveTrace(TRACE_CAPACITY, eliminations=True)
+    copy.extend(loaded.events())
+    events = copy.events()
+
+    return [event[1:] for event in events], events == trace.events()
+
+#  Every check maps its name to the reference function and the fast path,
+#  both take a grid and must return equal results.
+CHECKS = {
+    "conflicts": (sudoku_helper.get_conflicts,
+                  sudoku_helper.get_conflicts_fast),
+    "search": (sudoku_helper.get_possible_values, fast_possible_values),
+    "incremental": (sudoku_helper.get_candidate_masks,
+                    incremental_candidate_masks),
+    "save": (saved_history, loaded_history),
+    "variants": (scan_variant_conflicts, model_variant_conflicts),
+    "killer": (solve_killer, solve_killer_file),
+    "model-file": (expected_model_file, read_model_file_lines),
+    "trace": (traced_events, reloaded_events),
+}
+
+def run_chunk(task):
+    """
+    This function generates one chunk of boards from its seed and runs both
+    versions of the check on all of them, timing each version separately.
+
+    Parameters:
+        task -- tuple (name, seed, size) with the check name, the seed of
+                the chunk and the number of boards in it.
+
+    Returns:
+        board -- the first board of the chunk where the versions disagree,
+                 or None.
+        reference_time -- float seconds spent in the reference function.
+        fast_time -- float seconds spent in the fast path.
+
+    Pre-condition:
+        The check name must be in the CHECKS dictionary.
+
+    Post-condition:
+        The function will return the results of the chunk to the program.
+    """
+    name, seed, size = task
+    reference, fast = CHECKS[name]
+    rng = random.Random(seed)
+    boards = [random_board(rng) for _ in range(size)]
+
+    start = time.perf_counter()
+    expected = [reference(board) for board in boards]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [fast(board) for board in boards]
+    fast_time = time.perf_counter() - start
+
+    for board, want, got in zip(boards, expected, actual):
+        if want != got:
+            return board, reference_time, fast_time
+
+    return None, reference_time, fast_time
+
+def minimize_board(board, reference, fast):
+    """
+    This function keeps emptying the spaces of a board, one at a time, as
+    long as the two versions still disagree on it, until no single space
+    can be emptied anymore.
+
+    Parameters:
+        board -- array where each element is an array of integers organized
+                 by columns, on which the versions disagree.
+        reference -- reference function of the check.
+        fast -- fast path function of the check.
+
+    Returns:
+        board -- smaller board on which the versions still disagree.
+
+    Pre-condition:
+        The versions must disagree on the passed board.
+
+    Post-condition:
+        The function will return the minimized board to the program.
+    """
+    board = [list(column) for column in board]
+    changed = True
+
+    while changed:
+        changed = False
+        for col in range(9):
+            for row in range(9):
+                num = board[col][row]
+                if num == 0:
+                    continue
+                board[col][row] = 0
+                if reference(board) != fast(board):
+                    changed = True
+                else:
+                    board[col][row] = num
+
+    return board
+
+def run_harness(names, chunks, chunk_size, workers, seed):
+    """
+    This function runs every check on chunks of random boards, split among
+    worker processes, and prints a report line for each check. The chunks
+    are read back in order, so the first divergence reported is the same
+    for a given seed no matter how many workers are used.
+
+    Parameters:
+        names -- array of check names from the CHECKS dictionary.
+        chunks -- integer number of chunks per check.
+        chunk_size -- integer number of boards per chunk.
+        workers -- integer number of worker processes.
+        seed -- integer seed, every chunk gets its own seed from it.
+
+    Returns:
+        ok -- boolean that is False if any check found a divergence.
+
+    Pre-condition:
+        Every name must be in the CHECKS dictionary.
+
+    Post-condition:
+        The function will print the report to the output.
+    """
+    ok = True
+    rng = random.Random(seed)
+
+    with multiprocessing.Pool(workers) as pool:
+        for name in names:
+            tasks = [(name, rng.getrandbits(64), chunk_size)
+                     for _ in range(chunks)]
+            reference_time = 0.0
+            fast_time = 0.0
+            boards = 0
+            divergent = None
+
+            for board, ref_secs, fast_secs in pool.imap(run_chunk, tasks):
+                reference_time += ref_secs
+                fast_time += fast_secs
+                boards += chunk_size
+                if board is not None:
+                    divergent = board
+                    break
+
+            speedup = reference_time / fast_time if fast_time > 0 else 0.0
+            print("{}: {} boards, reference {:.3f}s, fast {:.3f}s, "
+                  "{:.1f}x".format(name, boards, reference_time, fast_time,
+                                   speedup))
+
+            if divergent is not None:
+                ok = False
+                reference, fast = CHECKS[name]
+                divergent = minimize_board(divergent, reference, fast)
+                print("ERROR: The versions of {} disagree on:".format(name))
+                sudoku_helper.print_grid(divergent)
+                print("reference: {}".format(reference(divergent)))
+                print("fast:      {}".format(fast(divergent)))
+
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that the fast "
+                                     "paths agree with the reference "
+                                     "functions on random boards.")
+    parser.add_argument("--check", action="append", choices=list(CHECKS),
+                        help="check to run, can be repeated, all of them by "
+                             "default")
+    parser.add_argument("--chunks", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = args.check or list(CHECKS)
+    ok = run_harness(names, args.chunks, args.chunk_size, args.workers,
+                     args.seed)
+
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,16 @@
              go back to the previous board, give possible solutions or
              point out conflicts, all depending on user input.
 """
+import array
+import json
+import multiprocessing
 import os
+import queue
+import random
+import struct
+import sys
+import threading
+import time
 
 class ListNode:
     """ Models a single node in a singly-linked list.  Has no methods, other
@@ -38,6 +47,422 @@ class ListNode:
 
         return " -> ".join(vals)
 
+class InvalidMove(Exception):
+    """ Raised by the set_value method of the BoardEngine when a 'set' cannot
+        be applied, with the reason given by the get_move_error function.
+    """
+
+class BoardEngine:
+    """ Models a board shared between one writer and many readers. The writer
+        applies 'set' and 'back' through the set_value and go_back methods,
+        which are serialized by a lock. Every grid in the linked list stack is
+        frozen (see freeze_grid), so readers take the current grid with the
+        snapshot method and query it without locks and without copying it.
+        A second linked list stack holds, for every grid, its pencil marks
+        (updated incrementally on every 'set') and the move that created it,
+        as the tuple of the space indexes it filled. The results computed
+        for a snapshot are cached for as long as its grid is in the stack.
+    """
+
+    def __init__(self, grid, log=b"", model=None):
+        """ Constructs the object; caller must pass the initial grid array,
+            which is frozen and stored as the only node of the linked list
+            stack, together with its pencil marks. When a game is loaded, the
+            grid is the last one saved and log holds the moves that led to
+            it (see encode_moves); the earlier grids are only rebuilt when
+            'back' reaches them. The model holds the rules of the variant,
+            classic sudoku if it is None.
+        """
+        self.model = CLASSIC_MODEL if model is None else model
+        self._lock = threading.Lock()
+        self._log = log
+        self._log_end = len(log)
+        self._head = ListNode(freeze_grid(grid))
+        self._states = ListNode((get_candidate_masks(self._head.val,
+                                                     self.model),
+                                 self._pop_move()))
+        self._top = (self._head.val, self._states.val[0])
+        self._results = {id(self._head.val):
+                         (self._head.val, {"masks": self._states.val[0]})}
+
+    def snapshot(self):
+        """ Returns the frozen grid of the current board. The grid never
+            changes, even if the writer keeps applying commands.
+        """
+        return self._top[0]
+
+    def set_value(self, col, row, val):
+        """ Applies a 'set' of the value at the column and row indexes and
+            updates the pencil marks of the new grid. Returns the new current
+            grid, or raises InvalidMove, leaving the board as it was, if the
+            move is not valid.
+        """
+        with self._lock:
+            error = get_move_error(self._head.val, col, row, val)
+            if error is not None:
+                raise InvalidMove(error)
+            new_node = ListNode(dup_frozen_grid(self._head.val, row, col, val))
+            new_node.next = self._head
+            self._head = new_node
+            masks = update_candidate_masks(self._states.val[0], col, row, val,
+                                           self.model, self._head.val)
+            self._push_state(masks, (col * 9 + row,))
+            return self._head.val
+
+    def go_back(self):
+        """ Applies a 'back' command with the go_back function, the pencil
+            marks of the previous grid are restored as they were. Returns the
+            new current grid.
+        """
+        with self._lock:
+            if self._head.next is None and self._states.val[1]:
+                self._load_previous()
+            old_head = self._head
+            self._head = go_back(old_head)
+            if self._head is not old_head:
+                self._states = self._states.next
+                self._top = (self._head.val, self._states.val[0])
+                del self._results[id(old_head.val)]
+            return self._head.val
+
+    def set_solution(self, grid, solved):
+        """ Pushes the solved grid as a single new node, so one 'back' undoes
+            the whole solution. Nothing is pushed, and False is returned, if
+            the board changed since the grid snapshot was taken.
+        """
+        with self._lock:
+            if self._head.val is not grid:
+                return False
+            move = tuple(index for index in range(81)
+                         if grid[index // 9][index % 9] == 0)
+            if move:
+                new_node = ListNode(freeze_grid(solved))
+                new_node.next = self._head
+                self._head = new_node
+                self._push_state(get_candidate_masks(new_node.val,
+                                                     self.model), move)
+            return True
+
+    def save(self):
+        """ Returns the game encoded by the encode_game function: the current
+            grid and every move of the linked list stack, including the moves
+            of a loaded game that were never rebuilt.
+        """
+        with self._lock:
+            moves = []
+            node = self._states
+            while node is not None:
+                if node.val[1]:
+                    moves.append(node.val[1])
+                node = node.next
+            moves.reverse()
+            return encode_game(self._head.val,
+                               self._log[:self._log_end] + encode_moves(moves))
+
+    def _push_state(self, masks, move):
+        """ Pushes the pencil marks and the move of the grid that was just
+            pushed to the linked list stack, and publishes both to readers.
+        """
+        new_node = ListNode((masks, move))
+        new_node.next = self._states
+        self._states = new_node
+        self._top = (self._head.val, masks)
+        self._results[id(self._head.val)] = (self._head.val,
+                                             {"masks": masks})
+
+    def _pop_move(self):
+        """ Returns the last move of the log that was not rebuilt yet, or an
+            empty tuple once the initial grid is reached.
+        """
+        if self._log_end == 0:
+            return ()
+        move, self._log_end = decode_last_move(self._log, self._log_end)
+        return move
+
+    def _load_previous(self):
+        """ Rebuilds the grid before the first node of the linked list stack,
+            which must also be the last one, by emptying the spaces of the
+            move that created it, and links it (with its pencil marks and
+            move) under that node. The marks are updated from the ones of
+            that node by the empty_candidate_masks function.
+        """
+        node = self._head
+        state = self._states
+
+        columns = [list(column) for column in node.val]
+        for index in state.val[1]:
+            columns[index // 9][index % 9] = 0
+        node.next = ListNode(freeze_grid(columns))
+        emptied = [(index, node.val[index // 9][index % 9])
+                   for index in state.val[1]]
+        state.next = ListNode((empty_candidate_masks(state.val[0],
+                                                     node.next.val, emptied,
+                                                     self.model),
+                               self._pop_move()))
+        self._results[id(node.next.val)] = (node.next.val,
+                                            {"masks": state.next.val[0]})
+
+    def get_candidate_masks(self, grid=None):
+        """ Returns the pencil marks of the given snapshot (or the current
+            one). The marks of every grid in the linked list stack are the
+            ones it was pushed with, they are only computed for a snapshot
+            that is no longer in the stack.
+        """
+        top_grid, masks = self._top
+        if grid is None or grid is top_grid:
+            return masks
+        return self._cached(grid, "masks",
+                            lambda grid: get_candidate_masks(grid, self.model))
+
+    def get_candidates(self, col, row, grid=None):
+        """ Returns the sorted array of candidates of the space at the column
+            and row indexes of the given snapshot (or the current one).
+        """
+        return mask_to_values(self.get_candidate_masks(grid)[col * 9 + row])
+
+    def get_conflicts(self, grid=None):
+        """ Returns the (kind, key) tuples of the regions in conflict in the
+            given snapshot (or the current one), found by the get_conflicts
+            method of the model and computed only once per snapshot.
+        """
+        return self._cached(grid, "conflicts", self.model.get_conflicts)
+
+    def get_possible_values(self, grid=None, trace=None):
+        """ Returns the same array as the get_possible_values function for
+            the given snapshot (or the current one), read from its pencil
+            marks and computed only once per snapshot. When a trace is
+            passed, the array is built again so that its events are recorded
+            (see masks_to_possible_values).
+        """
+        if grid is None:
+            grid, masks = self._top
+        else:
+            masks = self.get_candidate_masks(grid)
+        if trace is not None:
+            return masks_to_possible_values(grid, masks, trace)
+        return self._cached(grid, "possible",
+                            lambda grid: masks_to_possible_values(grid, masks))
+
+    def format_grid(self, grid=None):
+        """ Returns the format_grid function string for the given snapshot
+            (or the current one), computed only once per snapshot.
+        """
+        return self._cached(grid, "format", format_grid)
+
+    def _cached(self, grid, key, func):
+        """ Looks up the result of func for the snapshot in its own results,
+            computing and storing it on a miss. The writer keeps a (grid,
+            dict) tuple for every grid of the linked list stack, keyed by the
+            id of the grid, and drops it when 'back' pops the grid, so going
+            back and forth between snapshots keeps the results of each one.
+            A snapshot that is no longer in the stack is not cached, and
+            concurrent readers at worst compute the same result twice.
+        """
+        if grid is None:
+            grid = self.snapshot()
+        entry = self._results.get(id(grid))
+        if entry is None or entry[0] is not grid:
+            return func(grid)
+        results = entry[1]
+        if key not in results:
+            results[key] = func(grid)
+        return results[key]
+
+SAVE_MAGIC = b"SDK1"
+
+def encode_moves(moves):
+    """
+    This function encodes a delta log of moves. Every move is written as the
+    bytes of the space indexes it filled followed by a byte with how many
+    there are, so a 'set' takes two bytes and the log can be read backwards
+    from its end, one move at a time.
+
+    Parameters:
+        moves -- array of tuples of space indexes, the oldest move first.
+
+    Returns:
+        log -- bytes of the encoded moves.
+
+    Pre-condition:
+        The moves array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the log bytes to the program.
+    """
+    log = bytearray()
+
+    for move in moves:
+        log.extend(move)
+        log.append(len(move))
+
+    return bytes(log)
+
+def decode_last_move(log, end):
+    """
+    This function reads the move that ends at the given offset of a log
+    written by the encode_moves function.
+
+    Parameters:
+        log -- bytes of the encoded moves.
+        end -- integer offset right after the move to read.
+
+    Returns:
+        move -- tuple of the space indexes of the move.
+        start -- integer offset where the move starts, which is the end of
+                 the move before it.
+
+    Pre-condition:
+        The end offset must be the end of a move, such as len(log).
+
+    Post-condition:
+        The function will return the move and its start to the program.
+    """
+    start = end - 1 - log[end - 1]
+
+    return tuple(log[start:end - 1]), start
+
+def encode_game(grid, log):
+    """
+    This function encodes a game as the SAVE_MAGIC bytes, the grid with two
+    values per byte, and the delta log of the moves that led to the grid.
+    Since a move only fills empty spaces, the values of every move can be
+    read from the grid, so the log only holds space indexes.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        log -- bytes of the moves, as returned by encode_moves.
+
+    Returns:
+        data -- bytes of the encoded game.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the data bytes to the program.
+    """
+    values = [grid[col][row] for col in range(9) for row in range(9)] + [0]
+    packed = bytes(values[i] << 4 | values[i + 1] for i in range(0, 82, 2))
+
+    return SAVE_MAGIC + packed + log
+
+def decode_game(data):
+    """
+    This function decodes the bytes written by the encode_game function.
+    Only the grid is decoded, the log is returned as it is so that the moves
+    are rebuilt into grids when they are needed. The log is still checked
+    from end to start: every move must fit in the log, and every index must
+    be a space of the grid that holds a value and that no other move filled.
+
+    Parameters:
+        data -- bytes of an encoded game.
+
+    Returns:
+        grid -- array where each element is an array of integers organized
+                by columns, or None if the data is not a saved game.
+        log -- bytes of the moves, or None if the data is not a saved game.
+
+    Pre-condition:
+        The data bytes must be passed into the function.
+
+    Post-condition:
+        The function will return the grid and the log to the program.
+    """
+    header = len(SAVE_MAGIC) + 41
+    if len(data) < header or not data.startswith(SAVE_MAGIC):
+        return None, None
+
+    values = []
+    for byte in data[len(SAVE_MAGIC):header]:
+        values.append(byte >> 4)
+        values.append(byte & 15)
+
+    #  The last nibble only pads the 81 values to a whole byte.
+    if values.pop() != 0 or max(values) > 9:
+        return None, None
+
+    log = data[header:]
+    filled = set()
+    end = len(log)
+    while end > 0:
+        move, end = decode_last_move(log, end)
+        if end < 0 or len(move) == 0:
+            return None, None
+        for index in move:
+            if index >= 81 or values[index] == 0 or index in filled:
+                return None, None
+            filled.add(index)
+
+    return [values[col * 9:col * 9 + 9] for col in range(9)], log
+
+def save_game(user_lst, engine):
+    """
+    This function writes the game of the engine to the file named in the
+    'save' command.
+
+    Parameters:
+        user_lst -- array of strings of the 'save' command and its filename.
+        engine -- BoardEngine object of the current game.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The user command must have been 'save' with a filename.
+
+    Post-condition:
+        The function will write the file and print a message to the output.
+    """
+    try:
+        out_file = open(user_lst[1], 'wb')
+    except OSError:
+        print("ERROR: The file could not be opened.")
+    else:
+        out_file.write(engine.save())
+        out_file.close()
+        print("Game saved to {}.".format(user_lst[1]))
+
+def load_game(user_lst, engine):
+    """
+    This function reads the game in the file named in the 'load' command
+    and builds a new engine from it. Only the last grid is rebuilt, the
+    earlier ones are rebuilt by the engine when 'back' reaches them.
+    The loaded game keeps the variant rules of the passed engine.
+
+    Parameters:
+        user_lst -- array of strings of the 'load' command and its filename.
+        engine -- BoardEngine object of the current game.
+
+    Returns:
+        engine -- BoardEngine object of the loaded game, or the passed one if
+                  the file could not be loaded.
+
+    Pre-condition:
+        The user command must have been 'load' with a filename.
+
+    Post-condition:
+        The function will return the engine and print a message to the
+        output.
+    """
+    try:
+        in_file = open(user_lst[1], 'rb')
+    except OSError:
+        print("ERROR: The file could not be opened.")
+        return engine
+
+    data = in_file.read()
+    in_file.close()
+
+    grid, log = decode_game(data)
+    if grid is None:
+        print("ERROR: The file is not a saved game.")
+        return engine
+
+    print("Game loaded from {}.".format(user_lst[1]))
+
+    return BoardEngine(grid, log, engine.model)
+
 def get_strs_array(filename):
     """
     This function uses nested for loops to iterate over the input text file and
@@ -123,7 +548,7 @@ def arr_of_strs_to_2d_array(strs):
 
     return grid
 
-def get_commands(grid):
+def get_commands(grid, model=None):
     """
     This function uses a while True loop to continuously get the user input
     for a command. In the loop there is an if-elifs-else block to check and
@@ -132,6 +557,8 @@ def get_commands(grid):
     Parameters:
         grid -- array where each element is an array of characters organized
                 by columns.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
 
     Returns:
         None
@@ -140,17 +567,17 @@ def get_commands(grid):
         The obstacles set must exist and it must be valid.
 
     Post-condition:
-        The function will call any of the other functions based on the user
-        input, as well as printing the input prompt.
+        The function will call any of the BoardEngine methods based on the
+        user input, as well as printing the input prompt.
     """
-    head = ListNode(grid)
-    print_grid(head.val)
+    engine = BoardEngine(grid, model=model)
+    print_grid(engine.snapshot())
     print()
     print("Your command:")
     #  This loop will run until it reaches the end of a file and it
     #  will continuously ask user input for a command. Using an if-
     #  elifs-else block the command will be checked and the appropriate
-    #  function called.
+    #  engine method called.
     while True:
         try:
             user_command = input()
@@ -164,21 +591,47 @@ def get_commands(grid):
             if user_lst[0] == "set" and user_lst[1].isnumeric() and \
                user_lst[2].isnumeric() and user_lst[3].isnumeric():
                 print()
-                head = set_value(user_lst, head)
+                val = int(user_lst[3])
+                try:
+                    engine.set_value(int(user_lst[1]) - 1,
+                                     int(user_lst[2]) - 1, val)
+                except InvalidMove as error:
+                    print("ERROR: {}".format(error))
+                else:
+                    print("Square {},{} set to {}.".format(user_lst[1],
+                                                          user_lst[2], val))
         elif user_command == "back":
             print()
-            head = go_back(head)
+            engine.go_back()
         elif user_command == "search":
             print()
-            search_possible(head)
+            print_possible_values(engine.get_possible_values())
+        elif user_command == "candidates" or \
+             (len(user_command.split()) == 3 and
+              user_command.split()[0] == "candidates" and
+              user_command.split()[1].isnumeric() and
+              user_command.split()[2].isnumeric()):
+            print()
+            show_candidates(user_command.split(), engine)
         elif user_command == "conflicts":
             print()
-            find_conflicts(head)
+            print_region_conflicts(engine.get_conflicts())
+        elif user_command == "solve":
+            print()
+            solve_board(engine)
+        elif len(user_command.split()) == 2 and \
+             user_command.split()[0] == "save":
+            print()
+            save_game(user_command.split(), engine)
+        elif len(user_command.split()) == 2 and \
+             user_command.split()[0] == "load":
+            print()
+            engine = load_game(user_command.split(), engine)
         else:
             print()
             print("ERROR: Invalid command")
         print()
-        print_grid(head.val)
+        print(engine.format_grid())
         print()
         print("Your command:")
 
@@ -216,15 +669,49 @@ def go_back(head):
 
     return head
 
+def get_move_error(grid, col, row, val):
+    """
+    This function checks whether a value can be set in a space of the grid,
+    with the same checks, in the same order, as the 'set' command.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        col -- integer that represents the column index of the space.
+        row -- integer that represents the row index of the space.
+        val -- integer to be set in the space.
+
+    Returns:
+        error -- string that says why the value cannot be set, or None if
+                 it can.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the error to the program.
+    """
+    if col < 0 or col > 8 or row < 0 or row > 8:
+        return "The given column or row does not exist."
+    if grid[col][row] != 0:
+        return "The 'set' command cannot run, because the space already " \
+               "holds a value."
+    if val <= 0 or val > 9:
+        return "The value must be between 1 and 9."
+    return None
+
 def set_value(user_lst, head):
     """
     This function simply transforms the user specified location into
     integers, then calls the dup_grid function with the column, row and
     value to be changed. After this new grid is created, it is stored inside
     a new node and the new node is added to the linked list stack. There are
-    invalid input checks to ensure the sudoku grid is filled correctly.
+    invalid input checks, done by the get_move_error function, to ensure the
+    sudoku grid is filled correctly.
 
     Parameters:
+        user_lst -- array of strings of the 'set' command, its column, row
+                    and value.
         head -- ListNode object that represents the first node of the linked
                 list stack. It also gives access to the rest of the linked
                 list.
@@ -247,13 +734,9 @@ def set_value(user_lst, head):
     row = int(user_lst[2]) - 1
     val = int(user_lst[3])
 
-    if col < 0 or col > 8 or row < 0 or row > 8:
-        print("ERROR: The given column or row does not exist.")
-    elif head.val[col][row] != 0:
-        print("ERROR: The 'set' command cannot run, because ", end='')
-        print("the space already holds a value.")
-    elif val <= 0 or val > 9:
-        print("ERROR: The value must be between 1 and 9.")
+    error = get_move_error(head.val, col, row, val)
+    if error is not None:
+        print("ERROR: {}".format(error))
     else:
         print("Square {},{} set to {}.".format(user_lst[1], user_lst[2], val))
 
@@ -312,11 +795,67 @@ def dup_grid(grid, in_row, in_col, val):
 
     return duplicate
 
+def freeze_grid(grid):
+    """
+    This function turns every column of the grid array into a tuple, and the
+    grid itself into a tuple of those columns. The frozen grid can then be
+    handed to any number of readers without copying, because none of them
+    can change it.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        frozen -- tuple where each element is a tuple of integers organized
+                  by columns.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return an immutable copy of the grid array.
+    """
+    return tuple(tuple(column) for column in grid)
+
+def dup_frozen_grid(grid, in_row, in_col, val):
+    """
+    This function works like the dup_grid function, but for frozen grids.
+    Since the columns are tuples, only the column that holds the new value
+    is rebuilt and every other column is shared with the old grid, so no
+    aliasing problems can happen and almost nothing is copied.
+
+    Parameters:
+        grid -- tuple where each element is a tuple of integers organized
+                by columns.
+        in_row -- integer that represents the row number to have its value
+               changed in the new grid.
+        in_col -- integer that represents the column number to have its value
+               changed in the new grid.
+        val -- integer that will be 'inserted' into a the position on the
+               grid.
+
+    Returns:
+        duplicate -- tuple where each element is a tuple of integers organized
+                     by columns.
+
+    Pre-condition:
+        The grid must have been frozen with freeze_grid and be passed into
+        the function.
+
+    Post-condition:
+        The function will return a new frozen grid to the program, the passed
+        grid is left unchanged.
+    """
+    column = grid[in_col]
+    column = column[:in_row] + (val,) + column[in_row + 1:]
+
+    return grid[:in_col] + (column,) + grid[in_col + 1:]
+
 def find_conflicts(head):
     """
-    This function iterates through every returned array from the get_conflict
-    functions (column, row and sub-region) and prints an error message for each
-    position where there is a conflict using for loops.
+    This function calls the get_conflicts function on the grid of the first
+    node and then prints the conflicts with the print_conflicts function.
 
     Parameters:
         head -- ListNode object that represents the first node of the linked
@@ -331,17 +870,92 @@ def find_conflicts(head):
         function.
 
     Post-condition:
-        The function will print to the output if the operation is not possible,
-        otherwise, nothing is printed. Regardless, head (changed or unchanged)
-        is returned.
+        The function will print every conflict found to the output, or a
+        message saying that there are none.
     """
-    grid = head.val
+    columns, rows, squares = get_conflicts(head.val)
+    print_conflicts(columns, rows, squares)
+
+def get_conflicts(grid):
+    """
+    This function calls every get_conflict function (column, row and
+    sub-region) on the grid and returns their results sorted. It does not
+    print anything, so it can be used on a shared grid by many readers.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        columns -- sorted array of the columns where there are conflicts.
+        rows -- sorted array of the rows where there are conflicts.
+        squares -- sorted array of tuples of the sub-regions where there are
+                   conflicts.
 
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the three conflict arrays to the program.
+    """
     columns = sorted(get_conflict_cols(grid))
     rows = sorted(get_conflict_rows(grid))
     squares_dict = get_squares_dict(grid)
     squares = sorted(get_conflict_squares(squares_dict))
 
+    return columns, rows, squares
+
+def get_conflicts_fast(grid):
+    """
+    This function finds the same conflicts as the get_conflicts function,
+    but with the precomputed regions of the classic ConstraintModel, in a
+    single pass over every region with a bitmask of the values seen so far.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        columns -- sorted array of the columns where there are conflicts.
+        rows -- sorted array of the rows where there are conflicts.
+        squares -- sorted array of tuples of the sub-regions where there are
+                   conflicts.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the three conflict arrays to the program.
+    """
+    found = {"Column": [], "Row": [], "Sub-region": []}
+
+    for kind, key in CLASSIC_MODEL.get_conflicts(grid):
+        found[kind].append(key)
+
+    return found["Column"], found["Row"], found["Sub-region"]
+
+def print_conflicts(columns, rows, squares):
+    """
+    This function iterates through every array returned by the get_conflicts
+    function and prints an error message for each position where there is a
+    conflict using for loops.
+
+    Parameters:
+        columns -- sorted array of the columns where there are conflicts.
+        rows -- sorted array of the rows where there are conflicts.
+        squares -- sorted array of tuples of the sub-regions where there are
+                   conflicts.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The arrays must have been returned by the get_conflicts function.
+
+    Post-condition:
+        The function will print every conflict to the output, or a message
+        saying that there are none.
+    """
     #  If there are no conflicts, the appropriate message will be printed.
     if len(columns) == 0 and len(rows) == 0 and len(squares) == 0:
         print("Hooray!  No conflicts found.")
@@ -537,19 +1151,20 @@ def get_conflict_squares(squares_dict):
 
     return squares
 
-def search_possible(head):
+def search_possible(head, trace=None):
     """
-    This function uses nested for loops to iterate through every number in the
-    grid and check for every zero if there is a single possible solution by
-    calling the get_col, get_row and get_square functions and checking if
-    there is a number from 1 to 9 there has not been used yet and another for
-    loop is used for this. Then the function prints the correct message to
-    the output.
+    This function calls the get_possible_values function on the grid of the
+    first node and then prints the spaces with a single possible value and
+    the spaces with no possible values with the print_possible_values
+    function.
 
     Parameters:
         head -- ListNode object that represents the first node of the linked
                 list stack. It also gives access to the rest of the linked
                 list.
+        trace -- SolveTrace object that records the eliminations, and the
+                 value of every space with a single possible value as a
+                 placement, or None.
 
     Returns:
         None
@@ -564,9 +1179,36 @@ def search_possible(head):
         It can also print a no solutions found if the above conditions have not
         been met.
     """
-    grid = head.val
+    print_possible_values(get_possible_values(head.val, trace))
+
+def get_possible_values(grid, trace=None):
+    """
+    This function uses nested for loops to iterate through every number in the
+    grid and, for every zero, gets the numbers from 1 to 9 that have not been
+    used yet in its column, row and square by calling the get_col, get_row and
+    get_square functions. Another for loop is used for this.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        trace -- SolveTrace object that records the eliminations, and the
+                 value of every space with a single possible value as a
+                 placement, or None.
+
+    Returns:
+        possible -- array of tuples (col, row, nums) for every empty space in
+                    row order, where col and row are indexes and nums is the
+                    sorted array of values that can go in that space.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
 
-    possible = False
+    Post-condition:
+        The function will return the possible array to the program.
+    """
+    possible = []
+    if trace is not None:
+        trace.tick()
 
     #  These for loops iterate through every number in the grid and then
     #  if the number is zero (meaning the user can change it), it will
@@ -589,59 +1231,1784 @@ def search_possible(head):
                 for num in invalid_nums:
                     if num in nums:
                         nums.remove(num)
+                        if trace is not None and trace.eliminations:
+                            trace.record(TRACE_ELIMINATE, col * 9 + row, num,
+                                         0)
+                if trace is not None and len(nums) == 1:
+                    trace.record(TRACE_PLACE, col * 9 + row, nums[0], 0)
 
-                #  Checks if the length of the nums array is 1 for every run
-                #  of the inner loop and prints the appropriate message.
-                if len(nums) == 1:
-                    possible = True
-                    print("Solution!  The only value possible at", end='')
-                    print(" square {},{} is {}.".format(col+1, row+1, nums[0]))
-                elif len(nums) == 0:
-                    print("The square {},{}".format(col+1, row+1), end='')
-                    print(" does not have any possible values!")
-
-    if not possible:
-        print("Sorry, no solutions were found.")
+                possible.append((col, row, nums))
 
-def get_square_coords(col, row):
+    return possible
+
+def print_possible_values(possible):
     """
-    This function transforms the row and col numbers of the current integer
-    in the search_possible function loop and 'transforms' them into numbers
-    that can be used in the get_square function to get the square set. To do
-    this, if-elif-else blocks are used for both parameters.
+    This function uses a for loop to iterate through the array returned by
+    the get_possible_values function and prints the correct message to the
+    output for the spaces with one or zero possible values.
 
     Parameters:
-        col -- integer that represents the current column index of a number
-               on the grid.
-        row -- integer that represents the current row index of a number on
-               the grid.
+        possible -- array of tuples (col, row, nums) for every empty space in
+                    row order, where col and row are indexes and nums is the
+                    sorted array of values that can go in that space.
 
     Returns:
-        start_col -- integer that represents the sub-region x index of a
-                     number on the grid.
-        start_row -- integer that represents the sub-region y index of a
-                     number on the grid.
+        None
 
     Pre-condition:
-        The col and row integers must be passed to the function.
+        The possible array must exist and be passed into the function.
 
     Post-condition:
-        The function will return the start_col and start_row integers to the
-        program.
+        The function will print to the output all spaces and their solutions
+        (if there is only one solution) and the spaces that have no solutions.
+        It can also print a no solutions found if the above conditions have not
+        been met.
     """
-    if 0 <= row <= 2:
-        start_row = 0
-    elif 3 <= row <= 5:
-        start_row = 1
-    else:
-        start_row = 2
+    found = False
+
+    #  Checks the length of the nums array for every space and prints the
+    #  appropriate message.
+    for col, row, nums in possible:
+        if len(nums) == 1:
+            found = True
+            print("Solution!  The only value possible at", end='')
+            print(" square {},{} is {}.".format(col+1, row+1, nums[0]))
+        elif len(nums) == 0:
+            print("The square {},{}".format(col+1, row+1), end='')
+            print(" does not have any possible values!")
+
+    if not found:
+        print("Sorry, no solutions were found.")
 
-    if 0 <= col <= 2:
-        start_col = 0
-    elif 3 <= col <= 5:
-        start_col = 1
-    else:
-        start_col = 2
+class ConstraintModel:
+    """ Models the rules of a sudoku variant as data. Every region is a
+        (kind, key, spaces) tuple, where spaces holds the indexes (col * 9 +
+        row) of spaces that cannot repeat a value, and every killer cage is
+        a region of kind 'Cage' that also has a target sum. The peers of every
+        space, and the regions and cages it belongs to, are computed once when
+        the model is built, so that conflicts, pencil marks and solvers only
+        walk precomputed indexes.
+    """
+
+    def __init__(self, regions, cages=()):
+        """ Constructs the object; caller must pass the array of regions and,
+            optionally, the array of (target, spaces) killer cages. The cages
+            are added after the regions, numbered from 1.
+        """
+        regions = list(regions)
+        self.cages = tuple((target, tuple(spaces)) for target, spaces in cages)
+        for number, (target, spaces) in enumerate(self.cages):
+            regions.append(("Cage", number + 1, spaces))
+        self.regions = tuple((kind, key, tuple(spaces))
+                             for kind, key, spaces in regions)
+
+        peers = [set() for _ in range(81)]
+        space_regions = [[] for _ in range(81)]
+        space_cages = [[] for _ in range(81)]
+        for number, (kind, key, spaces) in enumerate(self.regions):
+            for index in spaces:
+                peers[index].update(spaces)
+                space_regions[index].append(number)
+                if kind == "Cage":
+                    space_cages[index].append(key - 1)
+        for index in range(81):
+            peers[index].discard(index)
+
+        self.peers = tuple(tuple(sorted(space)) for space in peers)
+        self.space_regions = tuple(tuple(space) for space in space_regions)
+        self.space_cages = tuple(tuple(space) for space in space_cages)
+
+    def get_conflicts(self, grid):
+        """ Returns the array of (kind, key) tuples of the regions of the grid
+            that repeat a value, in the order of the regions. A cage is also
+            in conflict if its values go over its target, or do not add up to
+            it once the cage is full.
+        """
+        values = [num for column in grid for num in column]
+        conflicts = []
+
+        for kind, key, spaces in self.regions:
+            seen = 0
+            for index in spaces:
+                num = values[index]
+                if num != 0:
+                    bit = 1 << num
+                    if seen & bit:
+                        break
+                    seen |= bit
+            else:
+                if kind != "Cage" or self.cage_sum_ok(values, key - 1, True):
+                    continue
+            conflicts.append((kind, key))
+
+        return conflicts
+
+    def cage_sum_ok(self, values, cage, exact=False):
+        """ Returns False if the values of the cage can no longer add up to
+            its target. With exact set, only a sum that went over the target
+            or a full cage with the wrong sum count, otherwise the smallest
+            and largest sums of the empty spaces are also used.
+        """
+        target, spaces = self.cages[cage]
+        total = 0
+        empty = 0
+
+        for index in spaces:
+            num = values[index]
+            if num == 0:
+                empty += 1
+            else:
+                total += num
+
+        left = target - total
+        if exact:
+            return left >= 0 and (empty > 0 or left == 0)
+
+        #  The empty spaces hold different values, so together they add up
+        #  to at least 1 + 2 + ... + empty and at most 9 + 8 + ....
+        return empty * (empty + 1) // 2 <= left <= empty * (19 - empty) // 2
+
+    def cage_mask(self, values, index):
+        """ Returns the bitmask of the values the cages of the empty space at
+            the index still allow, with the bounds of cage_sum_ok: once a
+            value is in the space, the other empty spaces of the cage must
+            still be able to add up to what is left. A space in no cage
+            allows every value.
+        """
+        mask = ALL_CANDIDATES
+
+        for cage in self.space_cages[index]:
+            target, spaces = self.cages[cage]
+            left = target
+            others = -1
+            for space in spaces:
+                num = values[space]
+                if num == 0:
+                    others += 1
+                else:
+                    left -= num
+            low = max(1, left - others * (19 - others) // 2)
+            high = min(9, left - others * (others + 1) // 2)
+            if low > high:
+                return 0
+            mask &= (1 << (high + 1)) - (1 << low)
+
+        return mask
+
+    def candidate_mask(self, values, index):
+        """ Returns the pencil marks of the empty space at the index, built
+            from the values of its peers and the sums of its cages.
+        """
+        mask = ALL_CANDIDATES
+        for num in {values[peer] for peer in self.peers[index]}:
+            mask &= ~(1 << num)
+
+        return mask & self.cage_mask(values, index)
+
+    def cages_ok(self, values, index):
+        """ Returns False if a cage of the space at the index can no longer
+            add up to its target. Classic models have no cages, so this is
+            a single empty loop for them.
+        """
+        for cage in self.space_cages[index]:
+            if not self.cage_sum_ok(values, cage):
+                return False
+
+        return True
+
+def get_classic_regions():
+    """
+    This function builds the regions of classic sudoku: the columns, then the
+    rows, then the 3x3 sub-regions, which are keyed by the same (x, y) tuples
+    as the get_squares_dict function.
+
+    Parameters:
+        None
+
+    Returns:
+        regions -- array of (kind, key, spaces) tuples.
+
+    Pre-condition:
+        None
+
+    Post-condition:
+        The function will return the regions array to the program.
+    """
+    regions = []
+
+    for col in range(9):
+        regions.append(("Column", col + 1, [col * 9 + row for row in range(9)]))
+    for row in range(9):
+        regions.append(("Row", row + 1, [col * 9 + row for col in range(9)]))
+    for x in range(3):
+        for y in range(3):
+            spaces = [col * 9 + row for col in range(x * 3, x * 3 + 3)
+                      for row in range(y * 3, y * 3 + 3)]
+            regions.append(("Sub-region", (x + 1, y + 1), spaces))
+
+    return regions
+
+def get_classic_model():
+    """
+    This function builds the ConstraintModel of classic sudoku from the
+    regions of the get_classic_regions function.
+
+    Parameters:
+        None
+
+    Returns:
+        model -- ConstraintModel object of classic sudoku.
+
+    Pre-condition:
+        None
+
+    Post-condition:
+        The function will return the model to the program.
+    """
+    return ConstraintModel(get_classic_regions())
+
+def get_diagonal_model():
+    """
+    This function builds the ConstraintModel of diagonal sudoku, which is
+    classic sudoku where the two long diagonals cannot repeat a value either.
+    Diagonal 1 goes down from square 1,1 and diagonal 2 goes up from 1,9.
+
+    Parameters:
+        None
+
+    Returns:
+        model -- ConstraintModel object of diagonal sudoku.
+
+    Pre-condition:
+        None
+
+    Post-condition:
+        The function will return the model to the program.
+    """
+    regions = get_classic_regions()
+    regions.append(("Diagonal", 1, [i * 9 + i for i in range(9)]))
+    regions.append(("Diagonal", 2, [i * 9 + 8 - i for i in range(9)]))
+
+    return ConstraintModel(regions)
+
+def get_jigsaw_model(layout):
+    """
+    This function builds the ConstraintModel of jigsaw sudoku, where the 3x3
+    sub-regions are replaced by nine irregular regions.
+
+    Parameters:
+        layout -- array of 9 strings, one per row, where every character is
+                  the name of the region of that space.
+
+    Returns:
+        model -- ConstraintModel object of the variant.
+
+    Pre-condition:
+        The layout must have 9 rows of 9 characters.
+
+    Post-condition:
+        The function will return the model to the program.
+    """
+    regions = get_classic_regions()[:18]
+    spaces = {}
+
+    for row in range(9):
+        for col in range(9):
+            spaces.setdefault(layout[row][col], []).append(col * 9 + row)
+    for name in sorted(spaces):
+        regions.append(("Region", name, spaces[name]))
+
+    return ConstraintModel(regions)
+
+def get_killer_model(cages, model=None):
+    """
+    This function adds killer cages to the regions of a model.
+
+    Parameters:
+        cages -- array of (target, spaces) tuples, where target is the sum of
+                 the cage and spaces holds the indexes of its spaces.
+        model -- ConstraintModel object to add the cages to, or None for
+                 classic sudoku.
+
+    Returns:
+        model -- new ConstraintModel object with the cages.
+
+    Pre-condition:
+        The cages array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the new model to the program.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    regions = [region for region in model.regions if region[0] != "Cage"]
+
+    return ConstraintModel(regions, model.cages + tuple(cages))
+
+def get_cage(words):
+    """
+    This function reads the words of a 'cage' line after the keyword: the
+    target sum followed by the col,row of every space of the cage.
+
+    Parameters:
+        words -- array of strings, the target and then one string per space.
+
+    Returns:
+        cage -- (target, spaces) tuple, where spaces holds the indexes of the
+                spaces, or None if the words do not make a valid cage.
+
+    Pre-condition:
+        The words array must be passed into the function.
+
+    Post-condition:
+        The function will return the cage to the program.
+    """
+    if len(words) < 2 or len(words) > 10:
+        return None
+
+    try:
+        target = int(words[0])
+        spaces = []
+        for space in words[1:]:
+            col, row = space.split(",")
+            col, row = int(col), int(row)
+            if not (1 <= col <= 9 and 1 <= row <= 9):
+                return None
+            spaces.append((col - 1) * 9 + row - 1)
+    except ValueError:
+        return None
+
+    #  The spaces of a cage hold different values, so there are smallest
+    #  and largest sums that its target must be between.
+    size = len(spaces)
+    if len(set(spaces)) != size or \
+       not size * (size + 1) // 2 <= target <= size * (19 - size) // 2:
+        return None
+
+    return target, spaces
+
+def is_jigsaw_layout(layout):
+    """
+    This function checks that a jigsaw layout has 9 rows of 9 characters,
+    naming 9 regions of 9 spaces each.
+
+    Parameters:
+        layout -- array of strings, one per row.
+
+    Returns:
+        valid -- boolean that is True if the layout is valid.
+
+    Pre-condition:
+        The layout array must be passed into the function.
+
+    Post-condition:
+        The function will return whether the layout is valid to the program.
+    """
+    if len(layout) != 9 or any(len(row) != 9 for row in layout):
+        return False
+
+    sizes = {}
+    for row in layout:
+        for name in row:
+            sizes[name] = sizes.get(name, 0) + 1
+
+    return len(sizes) == 9 and all(size == 9 for size in sizes.values())
+
+def read_model_file(filename):
+    """
+    This function reads a variant file and builds its ConstraintModel. Every
+    line is either 'diagonal', 'jigsaw' followed by the 9 rows of the layout,
+    or 'cage' followed by the target sum and the col,row of its spaces. A
+    file can have at most one of 'diagonal' and 'jigsaw', and any number of
+    cages.
+
+    Parameters:
+        filename -- string that contains the name of the variant file.
+
+    Returns:
+        model -- ConstraintModel object of the variant, or None if the file
+                 could not be opened or is not valid.
+
+    Pre-condition:
+        The filename string must be passed to the function.
+
+    Post-condition:
+        The function will return the model to the program, or print an error
+        message saying why there is none.
+    """
+    try:
+        in_file = open(filename, 'r')
+    except FileNotFoundError:
+        print("ERROR: The file could not be opened.")
+        return None
+
+    lines = []
+    for number, line in enumerate(in_file, 1):
+        words = line.split()
+        if len(words) != 0:
+            lines.append((number, words))
+    in_file.close()
+
+    model = None
+    cages = []
+    i = 0
+
+    #  Every keyword changes the model, the jigsaw keyword also reads the
+    #  next 9 lines as its layout. The first line that is not valid ends
+    #  the reading.
+    while i < len(lines):
+        number, words = lines[i]
+        valid = False
+        if words == ["diagonal"] and model is None:
+            model = get_diagonal_model()
+            valid = True
+        elif words == ["jigsaw"] and model is None:
+            layout = ["".join(row) for _, row in lines[i+1:i+10]]
+            if is_jigsaw_layout(layout):
+                model = get_jigsaw_model(layout)
+                valid = True
+            i += 9
+        elif words[0] == "cage":
+            cage = get_cage(words[1:])
+            if cage is not None:
+                cages.append(cage)
+                valid = True
+
+        if not valid:
+            print("ERROR: Line {} of the variant file is not valid."
+                  .format(number))
+            return None
+        i += 1
+
+    if model is None:
+        model = CLASSIC_MODEL
+    if len(cages) > 0:
+        model = get_killer_model(cages, model)
+
+    return model
+
+def print_region_conflicts(conflicts):
+    """
+    This function prints an error message for every region in the array
+    returned by the get_conflicts method of a ConstraintModel, with the same
+    messages as the print_conflicts function.
+
+    Parameters:
+        conflicts -- array of (kind, key) tuples of the regions in conflict.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The conflicts array must exist and be passed into the function.
+
+    Post-condition:
+        The function will print every conflict to the output, or a message
+        saying that there are none.
+    """
+    if len(conflicts) == 0:
+        print("Hooray!  No conflicts found.")
+
+    for kind, key in conflicts:
+        if isinstance(key, tuple):
+            key = ",".join(str(part) for part in key)
+        print("ERROR: {} {} has a conflict.".format(kind, key))
+
+CLASSIC_MODEL = get_classic_model()
+ALL_CANDIDATES = 0b1111111110
+
+def get_candidate_masks(grid, model=None):
+    """
+    This function builds the pencil marks of the whole grid from scratch.
+    The marks of a space are a bitmask where bit n is set if the value n can
+    still go in that space, and spaces that already hold a value have no
+    marks at all. Spaces in killer cages also lose the values their cage
+    sums no longer allow.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+
+    Returns:
+        masks -- tuple of 81 integers, the marks of every space by index
+                 (col * 9 + row).
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the masks tuple to the program.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    masks = []
+
+    #  For every empty space, the bits of the values of its peers are
+    #  removed from the bitmask of all values.
+    for col in range(9):
+        for row in range(9):
+            if grid[col][row] != 0:
+                masks.append(0)
+            else:
+                mask = ALL_CANDIDATES
+                for peer in model.peers[col * 9 + row]:
+                    mask &= ~(1 << grid[peer // 9][peer % 9])
+                masks.append(mask & ALL_CANDIDATES)
+
+    if model.cages:
+        values = [num for column in grid for num in column]
+        for index in range(81):
+            if values[index] == 0:
+                masks[index] &= model.cage_mask(values, index)
+
+    return tuple(masks)
+
+def update_candidate_masks(masks, col, row, val, model=None, grid=None):
+    """
+    This function updates the pencil marks after a value is set, without
+    looking at the rest of the grid: the space loses all of its marks and
+    its peers lose the mark of the value. When the space is in a killer
+    cage, the sum left for the cage changes, so the marks of its empty
+    spaces are built again from the grid.
+
+    Parameters:
+        masks -- tuple of 81 integers, the marks of every space by index.
+        col -- integer that represents the column index of the set space.
+        row -- integer that represents the row index of the set space.
+        val -- integer that was set in the space.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+        grid -- array where each element is an array of integers organized
+                by columns, with the value already set. It is only read, and
+                must only be passed, when the space is in a killer cage.
+
+    Returns:
+        new_masks -- tuple of 81 integers, the updated marks.
+
+    Pre-condition:
+        The masks must belong to the grid before the value was set and the
+        space must have been empty.
+
+    Post-condition:
+        The function will return the new masks tuple, the passed one is left
+        unchanged.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    new_masks = list(masks)
+    index = col * 9 + row
+    bit = ~(1 << val)
+
+    new_masks[index] = 0
+    for peer in model.peers[index]:
+        new_masks[peer] &= bit
+
+    if model.space_cages[index]:
+        values = [num for column in grid for num in column]
+        for cage in model.space_cages[index]:
+            for space in model.cages[cage][1]:
+                if values[space] == 0:
+                    new_masks[space] = model.candidate_mask(values, space)
+
+    return tuple(new_masks)
+
+def empty_candidate_masks(masks, grid, emptied, model=None):
+    """
+    This function updates the pencil marks after spaces are emptied, without
+    building them again for the whole grid: an emptied space gets the marks
+    its peers and cages leave it, and each of its empty peers gets back the
+    mark of the removed value unless another of its own peers still holds
+    it or its cages do not allow it. The empty spaces of the cages of an
+    emptied space are built again, since the sum left for them changed.
+
+    Parameters:
+        masks -- tuple of 81 integers, the marks of the grid before the
+                 spaces were emptied.
+        grid -- array where each element is an array of integers organized
+                by columns, with the spaces already emptied.
+        emptied -- array of (index, num) tuples of the emptied spaces and
+                   the values they held.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+
+    Returns:
+        new_masks -- tuple of 81 integers, the updated marks.
+
+    Pre-condition:
+        The masks must belong to the grid before the spaces were emptied.
+
+    Post-condition:
+        The function will return the new masks tuple, the passed one is left
+        unchanged.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    new_masks = list(masks)
+    values = [num for column in grid for num in column]
+    peers = model.peers
+
+    for index, num in emptied:
+        new_masks[index] = model.candidate_mask(values, index)
+
+        bit = 1 << num
+        for peer in peers[index]:
+            if values[peer] == 0 and not new_masks[peer] & bit:
+                for other in peers[peer]:
+                    if values[other] == num:
+                        break
+                else:
+                    new_masks[peer] |= bit & model.cage_mask(values, peer)
+
+        for cage in model.space_cages[index]:
+            for space in model.cages[cage][1]:
+                if values[space] == 0:
+                    new_masks[space] = model.candidate_mask(values, space)
+
+    return tuple(new_masks)
+
+def mask_to_values(mask):
+    """
+    This function uses a for loop to turn a pencil marks bitmask back into
+    the sorted array of the values it holds.
+
+    Parameters:
+        mask -- integer bitmask where bit n is set if n is a candidate.
+
+    Returns:
+        nums -- sorted array of integers from 1 to 9.
+
+    Pre-condition:
+        The mask integer must be passed into the function.
+
+    Post-condition:
+        The function will return the nums array to the program.
+    """
+    nums = []
+
+    for num in range(1, 10):
+        if mask & (1 << num):
+            nums.append(num)
+
+    return nums
+
+def masks_to_possible_values(grid, masks, trace=None):
+    """
+    This function builds the same array as the get_possible_values function,
+    but reads the values from the pencil marks instead of searching the
+    columns, rows and squares of the grid.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        masks -- tuple of 81 integers, the marks of every space of the grid.
+        trace -- SolveTrace object that records, like the get_possible_values
+                 function, the values missing from the marks of every space
+                 as eliminations and the value of every space with a single
+                 one as a placement, or None.
+
+    Returns:
+        possible -- array of tuples (col, row, nums) for every empty space in
+                    row order.
+
+    Pre-condition:
+        The masks must belong to the grid.
+
+    Post-condition:
+        The function will return the possible array to the program.
+    """
+    possible = []
+    if trace is not None:
+        trace.tick()
+
+    for row in range(9):
+        for col in range(9):
+            if grid[col][row] == 0:
+                index = col * 9 + row
+                nums = mask_to_values(masks[index])
+                if trace is not None:
+                    if trace.eliminations:
+                        for num in mask_to_values(ALL_CANDIDATES &
+                                                  ~masks[index]):
+                            trace.record(TRACE_ELIMINATE, index, num, 0)
+                    if len(nums) == 1:
+                        trace.record(TRACE_PLACE, index, nums[0], 0)
+                possible.append((col, row, nums))
+
+    return possible
+
+def print_candidates(possible):
+    """
+    This function uses a for loop to print the pencil marks of every space
+    in the possible array, one line per space.
+
+    Parameters:
+        possible -- array of tuples (col, row, nums) as returned by the
+                    masks_to_possible_values function.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The possible array must exist and be passed into the function.
+
+    Post-condition:
+        The function will print the candidates of every space to the output.
+    """
+    if len(possible) == 0:
+        print("There are no empty squares.")
+
+    for col, row, nums in possible:
+        if len(nums) == 0:
+            print("The square {},{}".format(col+1, row+1), end='')
+            print(" does not have any possible values!")
+        else:
+            print("Candidates at square {},{}: {}".format(
+                  col+1, row+1, " ".join(str(num) for num in nums)))
+
+def show_candidates(user_lst, engine):
+    """
+    This function transforms the user specified location into integers and
+    prints the pencil marks of that space, or of every empty space if no
+    location was given. There are invalid input checks for the location.
+
+    Parameters:
+        user_lst -- array of strings of the 'candidates' command and,
+                    optionally, its column and row.
+        engine -- BoardEngine object of the current game.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The user command must have been 'candidates' with zero or two
+        numeric arguments.
+
+    Post-condition:
+        The function will print the candidates or an error to the output.
+    """
+    if len(user_lst) == 1:
+        print_candidates(engine.get_possible_values())
+        return
+
+    col = int(user_lst[1]) - 1
+    row = int(user_lst[2]) - 1
+
+    if col < 0 or col > 8 or row < 0 or row > 8:
+        print("ERROR: The given column or row does not exist.")
+    elif engine.snapshot()[col][row] != 0:
+        print("The square {},{} already holds a value.".format(
+              user_lst[1], user_lst[2]))
+    else:
+        print_candidates([(col, row, engine.get_candidates(col, row))])
+
+TRACE_PLACE = 0
+TRACE_ELIMINATE = 1
+TRACE_BRANCH = 2
+TRACE_BACKTRACK = 3
+TRACE_RESTART = 4
+TRACE_NAMES = ("place", "eliminate", "branch", "backtrack", "restart")
+TRACE_MAGIC = b"SDT1"
+TRACE_HEADER = struct.Struct("<qI")
+TRACE_TIME_MASK = (1 << 42) - 1
+
+class SolveTrace:
+    """ Models a ring buffer of solve events. Every event (time, kind, space
+        index, value, depth) is packed into a single integer of an array that
+        is allocated once, so recording an event is a single store that does
+        not create any object, and once the buffer is full the oldest events
+        are overwritten. The kinds are the TRACE_ constants. From the lowest
+        bit up, an event holds the depth (7 bits), the value (4 bits), the
+        index (7 bits), the kind (3 bits) and the nanoseconds since the trace
+        was cleared (42 bits, so the time wraps around every 73 minutes).
+
+        Reading the clock costs more than recording an event, so the time is
+        only read by the tick method, which the solvers call once per branch
+        and backtrack, and every event gets the time of the last tick. A
+        trace can be emptied with clear and used again, so the buffer is not
+        allocated again for every solve. Eliminations are most of the events
+        of a propagation solver and make a traced solve several times
+        slower than the other events do, so they are only recorded when
+        asked for, and a trace that is always on should leave them out.
+    """
+
+    def __init__(self, capacity=4096, eliminations=False):
+        """ Constructs the object; caller may pass the number of events the
+            buffer holds, rounded up to a power of two, and whether
+            eliminations are recorded as well.
+        """
+        self.capacity = 1 << max(capacity - 1, 0).bit_length()
+        self.eliminations = eliminations
+        self._mask = self.capacity - 1
+        self._events = array.array("q", bytes(8 * self.capacity))
+        self.clear()
+
+    def clear(self):
+        """ Forgets every event, keeping the buffer, and restarts the clock.
+        """
+        self._count = 0
+        self._start = time.perf_counter_ns()
+        self._now = 0
+
+    def tick(self):
+        """ Reads the clock, the events recorded from now on get its time.
+        """
+        self._now = ((time.perf_counter_ns() - self._start) &
+                     TRACE_TIME_MASK) << 21
+
+    def record(self, kind, index, num, depth):
+        """ Records an event with the time of the last tick.
+        """
+        count = self._count
+        self._events[count & self._mask] = self._now | kind << 18 | \
+                                           index << 11 | num << 7 | depth
+        self._count = count + 1
+
+    def record_eliminations(self, indexes, num, depth):
+        """ Records an elimination of the value for every space index, which
+            is cheaper than one record call each.
+        """
+        events = self._events
+        mask = self._mask
+        base = self._now | TRACE_ELIMINATE << 18 | num << 7 | depth
+        count = self._count
+
+        for index in indexes:
+            events[count & mask] = base | index << 11
+            count += 1
+
+        self._count = count
+
+    def __len__(self):
+        """ Returns the number of events held, at most the capacity.
+        """
+        return min(self._count, self.capacity)
+
+    def dropped(self):
+        """ Returns the number of events that were overwritten.
+        """
+        return self._count - len(self)
+
+    def packed_events(self):
+        """ Returns an array of the packed events held, the oldest first.
+        """
+        if self._count <= self.capacity:
+            return self._events[:self._count]
+        slot = self._count & self._mask
+        return self._events[slot:] + self._events[:slot]
+
+    def events(self):
+        """ Returns the array of (time, kind, index, num, depth) tuples held,
+            the oldest first, with the time in perf_counter_ns nanoseconds.
+        """
+        result = []
+
+        for event in self.packed_events():
+            result.append((self._start + (event >> 21), event >> 18 & 7,
+                           event >> 11 & 127, event >> 7 & 15, event & 127))
+
+        return result
+
+    def extend(self, events):
+        """ Records every (time, kind, index, num, depth) tuple of events,
+            keeping their times, such as the events of the trace of a worker
+            process. An empty trace moves its start to the first event, so
+            that no time is before it.
+        """
+        for when, kind, index, num, depth in events:
+            if self._count == 0:
+                self._start = when
+            self._now = (max(when - self._start, 0) & TRACE_TIME_MASK) << 21
+            self.record(kind, index, num, depth)
+
+    def export(self, filename):
+        """ Writes the events to a compact file: the TRACE_MAGIC bytes, the
+            start time and number of events (see TRACE_HEADER) and then every
+            packed event in 8 bytes.
+        """
+        packed = self.packed_events()
+        if sys.byteorder != "little":
+            packed.byteswap()
+        out_file = open(filename, 'wb')
+        out_file.write(TRACE_MAGIC + TRACE_HEADER.pack(self._start,
+                                                       len(packed)))
+        out_file.write(packed.tobytes())
+        out_file.close()
+
+    def export_chrome(self, filename):
+        """ Writes the events to a JSON file that the Chrome trace viewer
+            (chrome://tracing, Perfetto) can open, one instant event each,
+            with times in microseconds from the first event.
+        """
+        events = self.events()
+        start = events[0][0] if len(events) > 0 else 0
+        trace_events = []
+
+        for when, kind, index, num, depth in events:
+            trace_events.append({
+                "name": TRACE_NAMES[kind], "ph": "i", "s": "t",
+                "ts": (when - start) / 1000, "pid": 1, "tid": 1,
+                "args": {"square": "{},{}".format(index // 9 + 1,
+                                                  index % 9 + 1),
+                         "value": num, "depth": depth}})
+
+        out_file = open(filename, 'w')
+        json.dump({"traceEvents": trace_events}, out_file)
+        out_file.close()
+
+def load_trace(filename):
+    """
+    This function reads a file written by the export method of SolveTrace
+    back into a new trace.
+
+    Parameters:
+        filename -- string that contains the name of the trace file.
+
+    Returns:
+        trace -- SolveTrace object with the events of the file, or None if
+                 the file is not a trace.
+
+    Pre-condition:
+        The file must exist.
+
+    Post-condition:
+        The function will return the trace to the program.
+    """
+    in_file = open(filename, 'rb')
+    data = in_file.read()
+    in_file.close()
+
+    header = len(TRACE_MAGIC) + TRACE_HEADER.size
+    if not data.startswith(TRACE_MAGIC) or len(data) < header:
+        return None
+    start, count = TRACE_HEADER.unpack_from(data, len(TRACE_MAGIC))
+    if len(data) != header + 8 * count:
+        return None
+
+    packed = array.array("q", data[header:])
+    if sys.byteorder != "little":
+        packed.byteswap()
+    trace = SolveTrace(max(count, 1))
+    trace._events[:count] = packed
+    trace._count = count
+    trace._start = start
+
+    return trace
+
+class SearchLimitReached(Exception):
+    """ Raised by the backtracking search when it has visited more nodes than
+        it was allowed to, so that the random restarts strategy can restart.
+    """
+
+def start_search(grid, model):
+    """
+    This function turns the grid into the flat array of values and the
+    pencil marks used by the solvers. If the givens already conflict, the
+    board cannot be solved and None is returned instead.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant.
+
+    Returns:
+        values -- array of 81 integers, the values of every space by index
+                  (col * 9 + row), or None if the givens conflict.
+        masks -- array of 81 integers, the pencil marks of every space, or
+                 None if the givens conflict.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the values and masks arrays to the program.
+    """
+    if len(model.get_conflicts(grid)) > 0:
+        return None, None
+
+    values = [grid[col][row] for col in range(9) for row in range(9)]
+
+    return values, list(get_candidate_masks(grid, model))
+
+def values_to_grid(values):
+    """
+    This function turns a flat array of 81 values back into a grid array
+    organized by columns.
+
+    Parameters:
+        values -- array of 81 integers, the values of every space by index.
+
+    Returns:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Pre-condition:
+        The values array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the grid array to the program.
+    """
+    return [values[col * 9:col * 9 + 9] for col in range(9)]
+
+def assign(values, masks, index, num, model, trace=None, depth=0):
+    """
+    This function sets a value in the values array and removes it from the
+    pencil marks of the peers of the space, changing both arrays in place.
+    When a trace is passed, the placement and, if the trace records them,
+    the marks that were actually removed are recorded.
+
+    Parameters:
+        values -- array of 81 integers, the values of every space by index.
+        masks -- array of 81 integers, the pencil marks of every space.
+        index -- integer index of the space to be set.
+        num -- integer that will be set in the space.
+        model -- ConstraintModel object of the variant.
+        trace -- SolveTrace object that records the events, or None.
+        depth -- integer number of guesses made so far, for the trace.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The space must be empty and num must be one of its candidates.
+
+    Post-condition:
+        The values and masks arrays will be changed in place.
+    """
+    bit = ~(1 << num)
+
+    values[index] = num
+    masks[index] = 0
+
+    if trace is not None:
+        trace.record(TRACE_PLACE, index, num, depth)
+        if trace.eliminations:
+            trace.record_eliminations([peer for peer in model.peers[index]
+                                       if masks[peer] & ~bit], num, depth)
+
+    for peer in model.peers[index]:
+        masks[peer] &= bit
+
+def propagate(values, masks, model, trace=None, depth=0):
+    """
+    This function keeps setting every empty space that has a single candidate
+    until there are none left. It stops early if an empty space runs out of
+    candidates, or a cage can no longer reach its sum, which means that the
+    board cannot be solved from here.
+
+    Parameters:
+        values -- array of 81 integers, the values of every space by index.
+        masks -- array of 81 integers, the pencil marks of every space.
+        model -- ConstraintModel object of the variant.
+        trace -- SolveTrace object that records the events, or None.
+        depth -- integer number of guesses made so far, for the trace.
+
+    Returns:
+        ok -- boolean that is False if the board cannot be solved.
+
+    Pre-condition:
+        The masks must belong to the values.
+
+    Post-condition:
+        The values and masks arrays will be changed in place.
+    """
+    changed = True
+
+    while changed:
+        changed = False
+        for index in range(81):
+            if values[index] == 0:
+                mask = masks[index]
+                if mask == 0:
+                    return False
+                #  A mask with a single bit set is a power of two.
+                if mask & (mask - 1) == 0:
+                    assign(values, masks, index, mask.bit_length() - 1, model,
+                           trace, depth)
+                    if not model.cages_ok(values, index):
+                        return False
+                    changed = True
+
+    return True
+
+def first_empty_space(values, masks):
+    """
+    This function uses a for loop to find the first empty space, in column
+    order. It is the branching order of plain backtracking.
+
+    Parameters:
+        values -- array of 81 integers, the values of every space by index.
+        masks -- array of 81 integers, the pencil marks of every space (not
+                 used, it is here so every branching order is called the
+                 same way).
+
+    Returns:
+        index -- integer index of the first empty space, or None if the
+                 board is full.
+
+    Pre-condition:
+        The values array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the index to the program.
+    """
+    for index in range(81):
+        if values[index] == 0:
+            return index
+
+    return None
+
+def fewest_candidates_space(values, masks):
+    """
+    This function uses a for loop to find the empty space with the fewest
+    candidates, ties are broken by the first space in column order. The loop
+    stops early on a space with one or zero candidates, since none can be
+    better.
+
+    Parameters:
+        values -- array of 81 integers, the values of every space by index.
+        masks -- array of 81 integers, the pencil marks of every space.
+
+    Returns:
+        index -- integer index of the chosen space, or None if the board is
+                 full.
+
+    Pre-condition:
+        The masks must belong to the values.
+
+    Post-condition:
+        The function will return the index to the program.
+    """
+    best = None
+    best_count = 10
+
+    for index in range(81):
+        if values[index] == 0:
+            count = bin(masks[index]).count("1")
+            if count < best_count:
+                best = index
+                best_count = count
+                if count <= 1:
+                    break
+
+    return best
+
+def backtrack(values, masks, model, choose_space, use_propagation=False,
+              rng=None, budget=None, trace=None, depth=0):
+    """
+    This function solves the board with a recursive depth first search. The
+    next space to try is picked by choose_space and every candidate of that
+    space is tried on a copy of the values and masks arrays.
+
+    Parameters:
+        values -- array of 81 integers, the values of every space by index.
+        masks -- array of 81 integers, the pencil marks of every space.
+        model -- ConstraintModel object of the variant.
+        choose_space -- function that takes values and masks and returns the
+                        index of the next space, or None if the board is full.
+        use_propagation -- boolean, if True the single candidates are set
+                           with the propagate function after every guess.
+        rng -- random.Random object used to shuffle the candidates, or None
+               to try them in increasing order.
+        budget -- array with a single integer, the number of nodes that can
+                  still be visited, or None for no limit.
+        trace -- SolveTrace object that records the events, or None.
+        depth -- integer number of guesses made so far.
+
+    Returns:
+        values -- array of 81 integers of the solved board, or None if there
+                  is no solution.
+
+    Pre-condition:
+        The masks must belong to the values and the givens must not conflict.
+
+    Post-condition:
+        The function will return the solved values array to the program. It
+        raises SearchLimitReached if the budget runs out.
+    """
+    if trace is not None:
+        trace.tick()
+    if use_propagation and not propagate(values, masks, model, trace, depth):
+        return None
+
+    index = choose_space(values, masks)
+    if index is None:
+        return values
+
+    nums = mask_to_values(masks[index])
+    if rng is not None:
+        rng.shuffle(nums)
+
+    #  Every candidate is tried on copies of the arrays, so that nothing has
+    #  to be undone when the guess turns out to be wrong.
+    for num in nums:
+        if budget is not None:
+            budget[0] -= 1
+            if budget[0] < 0:
+                raise SearchLimitReached()
+        if trace is not None:
+            trace.record(TRACE_BRANCH, index, num, depth)
+        new_values = values[:]
+        new_masks = masks[:]
+        assign(new_values, new_masks, index, num, model, trace, depth + 1)
+        solved = None
+        if model.cages_ok(new_values, index):
+            solved = backtrack(new_values, new_masks, model, choose_space,
+                               use_propagation, rng, budget, trace, depth + 1)
+        if solved is not None:
+            return solved
+        if trace is not None:
+            trace.tick()
+            trace.record(TRACE_BACKTRACK, index, num, depth)
+
+    return None
+
+def solve_first_empty(grid, model=None, trace=None):
+    """
+    This function solves the grid with plain backtracking, always filling
+    the first empty space.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+        trace -- SolveTrace object that records the search, or None.
+
+    Returns:
+        solved -- array where each element is an array of integers organized
+                  by columns, or None if there is no solution.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the solved grid to the program.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    values, masks = start_search(grid, model)
+    if values is None:
+        return None
+
+    solved = backtrack(values, masks, model, first_empty_space, trace=trace)
+
+    return None if solved is None else values_to_grid(solved)
+
+def solve_fewest_candidates(grid, model=None, trace=None):
+    """
+    This function solves the grid with constraint propagation, always
+    guessing the space with the fewest candidates.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+        trace -- SolveTrace object that records the search, or None.
+
+    Returns:
+        solved -- array where each element is an array of integers organized
+                  by columns, or None if there is no solution.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the solved grid to the program.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    values, masks = start_search(grid, model)
+    if values is None:
+        return None
+
+    solved = backtrack(values, masks, model, fewest_candidates_space, True,
+                       trace=trace)
+
+    return None if solved is None else values_to_grid(solved)
+
+def solve_random_restarts(grid, model=None, seed=None, trace=None):
+    """
+    This function solves the grid with constraint propagation, trying the
+    candidates in a random order. Whenever a run visits too many nodes it
+    is restarted with a new order and a budget twice as large, so that a bad
+    early guess cannot keep the search stuck.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+        seed -- seed of the random order, or None for a different order on
+                every call.
+        trace -- SolveTrace object that records the search, or None.
+
+    Returns:
+        solved -- array where each element is an array of integers organized
+                  by columns, or None if there is no solution.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the solved grid to the program.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    values, masks = start_search(grid, model)
+    if values is None:
+        return None
+
+    rng = random.Random(seed)
+    limit = 100
+
+    #  A run that ends without reaching its budget has searched every
+    #  possibility, so its answer (even None) is final.
+    while True:
+        try:
+            solved = backtrack(values[:], masks[:], model,
+                               fewest_candidates_space, True, rng, [limit],
+                               trace)
+        except SearchLimitReached:
+            limit *= 2
+            if trace is not None:
+                trace.tick()
+                trace.record(TRACE_RESTART, 0, 0, 0)
+        else:
+            return None if solved is None else values_to_grid(solved)
+
+def solve_exact_cover(grid, model=None, trace=None):
+    """
+    This function solves the grid as an exact cover problem with Knuth's
+    Algorithm X. Every space must hold a value and every region of 9 spaces
+    must hold each value, each constraint covered by exactly one placement.
+    Smaller regions, such as killer cages, can hold each value at most once,
+    and every placement in a cage is undone at once if the cage can no
+    longer add up to its target.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+        trace -- SolveTrace object that records the search, or None.
+
+    Returns:
+        solved -- array where each element is an array of integers organized
+                  by columns, or None if there is no solution.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the solved grid to the program.
+    """
+    if model is None:
+        model = CLASSIC_MODEL
+    values, masks = start_search(grid, model)
+    if values is None:
+        return None
+
+    #  rows maps every placement to the constraints it covers and columns
+    #  maps every constraint to the placements that cover it. Only the
+    #  primary constraints must be covered.
+    rows = {}
+    primary = set()
+    for index in range(81):
+        primary.add(("space", index))
+        for num in range(1, 10):
+            rows[(index, num)] = [("space", index)] + \
+                                 [("region", region, num)
+                                  for region in model.space_regions[index]]
+    for region, (kind, key, spaces) in enumerate(model.regions):
+        if len(spaces) == 9:
+            primary.update(("region", region, num) for num in range(1, 10))
+    columns = {}
+    for placement, constraints in rows.items():
+        for constraint in constraints:
+            columns.setdefault(constraint, set()).add(placement)
+
+    for index in range(81):
+        if values[index] != 0:
+            cover(columns, rows, (index, values[index]))
+
+    #  The values of the placements are kept up to date only for models with
+    #  cages, since the cage sums are all they are needed for.
+    def place(index, num):
+        values[index] = num
+        return num == 0 or model.cages_ok(values, index)
+
+    def accept(solution):
+        return all(model.cage_sum_ok(values, cage, True)
+                   for cage in range(len(model.cages)))
+
+    solution = exact_cover(columns, rows, primary, [], accept, trace,
+                           place if model.cages else None)
+    if solution is None:
+        return None
+
+    for index, num in solution:
+        values[index] = num
+
+    return values_to_grid(values)
+
+def cover(columns, rows, placement):
+    """
+    This function removes the constraints covered by the placement, and
+    every placement that conflicts with it, from the columns dictionary.
+
+    Parameters:
+        columns -- dictionary of every constraint left to the set of the
+                   placements that cover it.
+        rows -- dictionary of every placement to the array of constraints
+                it covers.
+        placement -- tuple (index, num) that is chosen.
+
+    Returns:
+        removed -- array of the sets that were removed from columns.
+
+    Pre-condition:
+        The constraints of the placement must all be in columns.
+
+    Post-condition:
+        The columns dictionary is changed in place, the uncover function
+        can put it back with the removed array.
+    """
+    removed = []
+
+    for constraint in rows[placement]:
+        for other in columns[constraint]:
+            for other_constraint in rows[other]:
+                if other_constraint != constraint:
+                    columns[other_constraint].remove(other)
+        removed.append(columns.pop(constraint))
+
+    return removed
+
+def uncover(columns, rows, placement, removed):
+    """
+    This function undoes the cover function by putting the removed sets back
+    in the opposite order.
+
+    Parameters:
+        columns -- dictionary of every constraint left to the set of the
+                   placements that cover it.
+        rows -- dictionary of every placement to the array of constraints
+                it covers.
+        placement -- tuple (index, num) that was chosen.
+        removed -- array returned by the cover call of the placement.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The placement must be the last one that was covered.
+
+    Post-condition:
+        The columns dictionary is back as it was before the cover call.
+    """
+    for constraint in reversed(rows[placement]):
+        columns[constraint] = removed.pop()
+        for other in columns[constraint]:
+            for other_constraint in rows[other]:
+                if other_constraint != constraint:
+                    columns[other_constraint].add(other)
+
+def exact_cover(columns, rows, primary, solution, accept, trace=None,
+                place=None):
+    """
+    This function is Algorithm X: it picks the primary constraint with the
+    fewest placements left and tries each of them recursively.
+
+    Parameters:
+        columns -- dictionary of every constraint left to the set of the
+                   placements that cover it.
+        rows -- dictionary of every placement to the array of constraints
+                it covers.
+        primary -- set of the constraints that must be covered.
+        solution -- array of the placements chosen so far.
+        accept -- function that takes a complete solution and returns False
+                  if it must be rejected, so that the search goes on.
+        trace -- SolveTrace object that records every placement tried as a
+                 branch and every one undone as a backtrack, or None.
+        place -- function that takes the index and value of every placement
+                 tried and returns False if it must be undone at once, or
+                 None. It is called again with the value 0 when the
+                 placement is undone.
+
+    Returns:
+        solution -- array of the chosen placements, or None if there is no
+                    accepted exact cover.
+
+    Pre-condition:
+        The givens must have been covered already.
+
+    Post-condition:
+        The function will return the placements to the program, columns is
+        left as it was passed.
+    """
+    left = [key for key in columns if key in primary]
+    if not left:
+        return list(solution) if accept(solution) else None
+
+    constraint = min(left, key=lambda key: len(columns[key]))
+
+    for placement in list(columns[constraint]):
+        if trace is not None:
+            trace.tick()
+            trace.record(TRACE_BRANCH, placement[0], placement[1],
+                         len(solution))
+        solution.append(placement)
+        removed = cover(columns, rows, placement)
+        found = None
+        if place is None or place(placement[0], placement[1]):
+            found = exact_cover(columns, rows, primary, solution, accept,
+                                trace, place)
+        if place is not None:
+            place(placement[0], 0)
+        uncover(columns, rows, placement, removed)
+        solution.pop()
+        if found is not None:
+            return found
+        if trace is not None:
+            trace.tick()
+            trace.record(TRACE_BACKTRACK, placement[0], placement[1],
+                         len(solution))
+
+    return None
+
+class PortfolioFailed(Exception):
+    """ Raised by the portfolio when every strategy failed or its worker
+        process died, so that there is neither an answer nor a timeout.
+    """
+
+#  Number of seconds the portfolio waits for a result before it checks
+#  whether any worker process died without putting one.
+PORTFOLIO_POLL = 0.1
+
+STRATEGIES = {
+    "first-empty": solve_first_empty,
+    "fewest-candidates": solve_fewest_candidates,
+    "random-restarts": solve_random_restarts,
+    "exact-cover": solve_exact_cover,
+}
+
+def portfolio_worker(name, grid, model, trace_settings, results):
+    """
+    This function runs a single strategy of the portfolio in a worker process
+    and puts its name and result in the results queue, with the events of
+    its own trace if one was asked for. The result is put even if the
+    strategy fails, so the race never hangs waiting for it, but then it is
+    marked as not finished, since its None proves nothing.
+
+    Parameters:
+        name -- string name of the strategy in the STRATEGIES dictionary.
+        grid -- array where each element is an array of integers organized
+                by columns.
+        model -- ConstraintModel object of the variant.
+        trace_settings -- (capacity, eliminations) tuple of the trace of the
+                          worker, or None to run without a trace.
+        results -- multiprocessing.Queue shared by every worker.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The function must be the target of a worker process.
+
+    Post-condition:
+        A (name, solved, finished, events) tuple is put in the results queue.
+    """
+    trace = None
+    if trace_settings is not None:
+        trace = SolveTrace(*trace_settings)
+    solved = None
+    finished = False
+    try:
+        solved = STRATEGIES[name](grid, model, trace=trace)
+        finished = True
+    finally:
+        results.put((name, solved, finished,
+                     None if trace is None else trace.events()))
+
+def solve_portfolio(grid, strategies=None, timeout=None, model=None,
+                    trace=None):
+    """
+    This function starts every strategy in its own worker process and
+    returns the first answer found. The other workers are then terminated.
+    Since every strategy is a complete search, the first one that finishes
+    without a solution proves that there is none, so the race also ends
+    there.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns, as returned by arr_of_strs_to_2d_array.
+        strategies -- array of names from the STRATEGIES dictionary, or None
+                      to race all of them but exact-cover when the model
+                      has cages, since it only sees a cage sum once it
+                      places a value in the cage.
+        timeout -- number of seconds to wait for a solution, or None to wait
+                   until the race is over.
+        model -- ConstraintModel object of the variant, or None for classic
+                 sudoku.
+        trace -- SolveTrace object that gets the events of the winning
+                 strategy, or None.
+
+    Returns:
+        name -- string name of the winning strategy, or None if the timeout
+                expired.
+        solved -- array where each element is an array of integers organized
+                  by columns, or None if there is no solution or there is no
+                  winner.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the winner and its solution to the program
+        and no worker process is left running. PortfolioFailed is raised if
+        every strategy failed, including workers that died without putting
+        a result.
+    """
+    if strategies is None:
+        strategies = [name for name in STRATEGIES
+                      if not (name == "exact-cover" and model is not None and
+                              model.cages)]
+    grid = [list(column) for column in grid]
+
+    trace_settings = None
+    if trace is not None:
+        trace_settings = (trace.capacity, trace.eliminations)
+    results = multiprocessing.Queue()
+    workers = []
+    for name in strategies:
+        worker = multiprocessing.Process(target=portfolio_worker, name=name,
+                                         args=(name, grid, model,
+                                               trace_settings, results),
+                                         daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    winner = (None, None)
+    pending = list(workers)
+
+    #  Results are read until a strategy finishes, with or without a
+    #  solution, every worker has answered or died, or the time is up. A
+    #  worker that exited has flushed its result before, so it is only
+    #  given up on when a wait that started after its exit saw nothing.
+    try:
+        while pending:
+            wait = PORTFOLIO_POLL
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                wait = min(wait, left)
+            exited = [worker for worker in pending
+                      if worker.exitcode is not None]
+            try:
+                name, solved, finished, events = results.get(timeout=wait)
+            except queue.Empty:
+                pending = [worker for worker in pending
+                           if worker not in exited]
+                continue
+            pending.pop([worker.name for worker in pending].index(name))
+            if finished:
+                winner = (name, solved)
+                if trace is not None:
+                    trace.extend(events)
+                break
+        else:
+            raise PortfolioFailed()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+    return winner
+
+def solve_board(engine, timeout=10):
+    """
+    This function races every strategy on the current board with the
+    solve_portfolio function and, if a solution is found, pushes it to the
+    engine so that a single 'back' undoes it.
+
+    Parameters:
+        engine -- BoardEngine object of the current game.
+        timeout -- number of seconds to wait for the race.
+
+    Returns:
+        None
+
+    Pre-condition:
+        The engine must exist and be passed into the function.
+
+    Post-condition:
+        The function will print the winning strategy, that there is no
+        solution, that the time ran out, or that every strategy failed, to
+        the output.
+    """
+    grid = engine.snapshot()
+    try:
+        name, solved = solve_portfolio(grid, timeout=timeout,
+                                       model=engine.model)
+    except PortfolioFailed:
+        print("ERROR: Every strategy failed to solve the board.")
+        return
+
+    if name is None:
+        print("Sorry, the board could not be solved in {} seconds."
+              .format(timeout))
+    elif solved is None:
+        print("Sorry, the board does not have a solution.")
+    elif engine.set_solution(grid, solved):
+        print("Board solved by the {} strategy.".format(name))
+    else:
+        print("ERROR: The board changed while it was being solved.")
+
+def get_square_coords(col, row):
+    """
+    This function transforms the row and col numbers of the current integer
+    in the search_possible function loop and 'transforms' them into numbers
+    that can be used in the get_square function to get the square set. To do
+    this, if-elif-else blocks are used for both parameters.
+
+    Parameters:
+        col -- integer that represents the current column index of a number
+               on the grid.
+        row -- integer that represents the current row index of a number on
+               the grid.
+
+    Returns:
+        start_col -- integer that represents the sub-region x index of a
+                     number on the grid.
+        start_row -- integer that represents the sub-region y index of a
+                     number on the grid.
+
+    Pre-condition:
+        The col and row integers must be passed to the function.
+
+    Post-condition:
+        The function will return the start_col and start_row integers to the
+        program.
+    """
+    if 0 <= row <= 2:
+        start_row = 0
+    elif 3 <= row <= 5:
+        start_row = 1
+    else:
+        start_row = 2
+
+    if 0 <= col <= 2:
+        start_col = 0
+    elif 3 <= col <= 5:
+        start_col = 1
+    else:
+        start_col = 2
 
     return start_col, start_row
 
@@ -759,11 +3126,8 @@ def get_square(grid, sx, sy):
 
 def print_grid(grid):
     """
-    This function uses nested for loops to print the grid array divided into
-    9 3x3 sub-regions. The outer loop will print vertical spaces between
-    sub-regions, the middle loop will print out the numbers and horizontal
-    spaces between sub-regions and the inner loop will transform integers
-    to strings to print out.
+    This function prints the string returned by the format_grid function,
+    which is the grid array divided into 9 3x3 sub-regions.
 
     Parameters:
         grid -- array where each element is an array of integers organized
@@ -778,9 +3142,35 @@ def print_grid(grid):
     Post-condition:
         The function will print the sudoku grid to the output.
     """
-    #  Iterates over every column and prints out the vertical spacing.
+    print(format_grid(grid))
+
+def format_grid(grid):
+    """
+    This function uses nested for loops to build a string of the grid array
+    divided into 9 3x3 sub-regions. The outer loop will add vertical spaces
+    between sub-regions, the middle loop will add the numbers and horizontal
+    spaces between sub-regions and the inner loop will transform integers
+    to strings.
+
+    Parameters:
+        grid -- array where each element is an array of integers organized
+                by columns.
+
+    Returns:
+        text -- string of the sudoku grid, with one line per row.
+
+    Pre-condition:
+        The grid array must exist and be passed into the function.
+
+    Post-condition:
+        The function will return the sudoku grid string to the program.
+    """
+    lines = []
+
+    #  Iterates over every column and adds the vertical spacing.
     for i in range(9):
-        #  Iterates trough every 3 columns and prints out the 9 numbers
+        line = ""
+        #  Iterates trough every 3 columns and adds the 9 numbers
         #  (with a period for 0), of each row
         for j in range(0, 9, 3):
             num1 = grid[j][i]
@@ -794,22 +3184,36 @@ def print_grid(grid):
                     numbers[k] = "."
                 else:
                     numbers[k] = str(numbers[k])
-            print(numbers[0] + numbers[1] + numbers[2], end='')
-            # Prints the spacing between horizontal sub-regions.
+            line += numbers[0] + numbers[1] + numbers[2]
+            # Adds the spacing between horizontal sub-regions.
             if j != 6:
-                print(" ", end='')
-        print()
+                line += " "
+        lines.append(line)
         #  Separates each vertical sub-region with blank line.
         if i % 3 == 2 and i != 8:
-            print()
+            lines.append("")
+
+    return "\n".join(lines)
 
 def main():
     # chdir to the same directory as where this script is ... so
     # that open() will open the file we expect.
+    # The variant file is given on the command line, so it is found from
+    # the directory the program was started in.
+    variant = None
+    if len(sys.argv) > 1:
+        variant = os.path.abspath(sys.argv[1])
+
     this_script = os.path.realpath(__file__)
     dir_of_script = os.path.dirname(this_script)
     os.chdir(dir_of_script)
 
+    model = None
+    if variant is not None:
+        model = read_model_file(variant)
+        if model is None:
+            return
+
     print("Please give the name of the file that contains the board:")
     filename = input()
 
@@ -817,7 +3221,7 @@ def main():
 
     if file_array != []:
         grid = arr_of_strs_to_2d_array(file_array)
-        get_commands(grid)
+        get_commands(grid, model)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file